@@ -0,0 +1,18 @@
+-- Partial indexes over live (not soft-deleted) rows. The search service reads
+-- chunks per organization with "isDeleted" = false and joins their embeddings,
+-- so these indexes skip deleted rows instead of filtering them after the scan.
+-- Prisma cannot express WHERE clauses on @@index, so they live only here.
+--
+-- Prisma runs a migration file as one transaction, which rules out
+-- CREATE INDEX CONCURRENTLY. On a large live table, create the indexes
+-- CONCURRENTLY by hand before deploying; IF NOT EXISTS turns this into a no-op.
+-- Run VACUUM ANALYZE on the three tables afterwards.
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "Document_organizationId_live_idx" ON "Document"("organizationId") WHERE "isDeleted" = false;
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "Chunk_organizationId_live_idx" ON "Chunk"("organizationId") WHERE "isDeleted" = false;
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "Embedding_chunkId_live_idx" ON "Embedding"("chunkId") WHERE "isDeleted" = false;
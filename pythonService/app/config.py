@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 from pydantic import Field, validator
 from pydantic_settings import BaseSettings
@@ -20,6 +20,11 @@ class Settings(BaseSettings):
 
     # DATABASE CONFIGURATION (Required from environment)
     DATABASE_URL: str = Field(..., description="Postgres DB connection URL")
+    DB_POOL_MIN_SIZE: Optional[int] = Field(default=None, description="Minimum pooled connections (default: max size / 4)")
+    DB_POOL_MAX_SIZE: Optional[int] = Field(default=None, description="Maximum pooled connections (default: 2 * CPU cores + 1)")
+    DB_POOL_MAX_QUERIES: int = Field(default=50000, description="Queries served by a connection before it is replaced")
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = Field(default=300.0, description="Seconds an idle connection is kept open")
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=1024, description="Prepared statements cached per pooled connection")
 
     OPENAI_API_KEY: str = Field(..., description="OpenAI API key")
     GOOGLE_API_KEY: str = Field(..., description="Google API key for Gemini")
@@ -28,18 +33,44 @@ class Settings(BaseSettings):
     OPENAI_EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="OpenAI embedding model")
     EMBEDDING_BATCH_SIZE: int = Field(default=100, description="Batch size for embedding generation")
     EMBEDDING_MAX_RETRIES: int = Field(default=3, description="Max retries for embedding API calls")
+    EMBEDDING_MAX_CONCURRENCY: int = Field(default=4, description="Max concurrent OpenAI embedding requests")
+    EMBEDDING_CACHE_SIZE: int = Field(default=10000, description="Embeddings kept in the in-process LRU cache (0 disables it)")
+    EMBEDDING_QUANTIZE_INT8: bool = Field(default=True, description="Store embeddings as int8 with a per-vector scale")
+    EMBEDDING_HALF_PRECISION: bool = Field(default=True, description="Run the local embedding model in float16 when it is on a GPU")
+    EMBEDDING_DIMENSION: Optional[int] = Field(default=None, description="Expected embedding dimension; stored vectors of any other size are skipped")
 
     # LLM Configuration
     LLM_PROVIDER: str = Field(default="gemini", description="gemini or ollama")
     LLM_MODEL: str = "llama3:8b"  # For running LLM locally
     LLM_TEMPERATURE: float = 0.0
     LLM_MAX_TOKENS: int = 16384
+    LLM_MAX_CONCURRENCY: int = Field(default=8, description="Max concurrent LLM requests")
+    CONTEXT_CACHE_SIZE: int = Field(default=1024, description="Chunk contexts kept in the in-process LRU cache (0 disables it)")
 
     GEMINI_MODEL: str = Field(default="gemini-2.0-flash-exp", description="Gemini model name")
     GEMINI_TEMPERATURE: float = Field(default=0.0, description="Gemini temperature")
     GEMINI_MAX_TOKENS: int = Field(default=8192, description="Gemini max tokens")
     GEMINI_MAX_RETRIES: int = Field(default=3, description="Max retries for Gemini API calls")
 
+    # Chunking Configuration
+    CHUNKING_USE_PUNKT: bool = Field(default=False, description="Use NLTK Punkt instead of the regex sentence splitter")
+
+    # Metadata Extraction Configuration
+    METADATA_BATCH_SIZE: int = Field(default=20, description="Chunks sent per metadata extraction request")
+
+    # Document Processing Configuration
+    PIPELINE_MAX_CONCURRENT_WRITES: int = Field(default=4, description="Documents writing chunks to the database at once")
+
+    # Document Conversion Configuration
+    DOCUMENT_CONVERSION_WORKERS: Optional[int] = Field(default=None, description="Document conversion worker processes (default: CPU cores / 2)")
+    OCR_DET_MODEL_PATH: Optional[str] = Field(default=None, description="RapidOCR detection ONNX model, e.g. an int8-quantized one")
+    OCR_REC_MODEL_PATH: Optional[str] = Field(default=None, description="RapidOCR recognition ONNX model, e.g. an int8-quantized one")
+    PICTURE_DESCRIPTION_BATCH_SIZE: int = Field(default=8, description="Pictures described per VLM batch")
+
+    # GNN Recommendation Configuration
+    GNN_GRAPH_TTL: float = Field(default=300.0, description="Seconds the membership graph is reused before it is rebuilt")
+    GNN_COMPILE: bool = Field(default=False, description="Run the GNN through torch.compile (slow first call, faster after)")
+
     # LOGGING CONFIGURATION
     LOG_LEVEL: str = Field(default="INFO", description="Logging level")
 
@@ -5,6 +5,7 @@ import uvicorn
 from app.config import get_settings
 from app.routers import documents, search
 from app.services.database_service import database_service
+from app.services.document_conversion_service import shutdown_conversion_pool
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -30,6 +31,7 @@ async def lifespan(app: FastAPI):
     # Cleanup resources
     await database_service.disconnect()
     logger.info("Database connection closed")
+    shutdown_conversion_pool()
 
 
 app = FastAPI(
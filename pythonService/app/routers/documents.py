@@ -6,6 +6,7 @@ import os
 import uuid
 from datetime import datetime
 import aiofiles
+import orjson
 
 from app.services.document_processing_pipeline import document_processing_pipeline
 from app.services.database_service import database_service
@@ -80,8 +81,7 @@ async def upload_document(
         restricted_users = []
         if restricted_to_users:
             try:
-                import json
-                restricted_users = json.loads(restricted_to_users)
+                restricted_users = orjson.loads(restricted_to_users)
             except:
                 raise HTTPException(status_code=400, detail="Invalid restricted_to_users format")
 
@@ -365,8 +365,7 @@ class HNSWIndex:
                         if group_id:
                             similarity_score = 1.0 / (1.0 + float(distance))
 
-                            import asyncio
-                            asyncio.create_task(self._log_group_access_denial(
+                            self._log_group_access_denial(
                                 user_id=user_id,
                                 organization_id=self.organization_id,
                                 search_query=search_query,
@@ -374,7 +373,7 @@ class HNSWIndex:
                                 document_id=node.document_id,
                                 group_id=group_id,
                                 similarity_score=similarity_score
-                            ))
+                            )
                     continue
 
                 filtered_results.append((distance, node_id, node))
@@ -597,7 +596,7 @@ class HNSWIndex:
                     doc_group_id not in user_groups and
                     user_role != "ADMIN")
 
-    async def _log_group_access_denial(
+    def _log_group_access_denial(
         self,
         user_id: str,
         organization_id: str,
@@ -609,7 +608,7 @@ class HNSWIndex:
     ) -> None:
 
         try:
-            await database_service.log_access_denial(
+            database_service.queue_access_denial(
                 organization_id=organization_id,
                 user_id=user_id,
                 search_query=search_query,
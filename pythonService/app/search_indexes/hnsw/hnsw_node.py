@@ -26,7 +26,9 @@ class HNSWNode:
             max_layer: Highest layer this node exists on
         """
         self.id = str(uuid.uuid4())
-        self.vector = vector.astype(np.float32)
+        # Rows of the index build matrix are already float32; keep them as
+        # views instead of copying every vector
+        self.vector = vector.astype(np.float32, copy=False)
         self.chunk_id = chunk_id
         self.document_id = document_id
         self.metadata = metadata
@@ -1,40 +1,101 @@
+import asyncio
+import hashlib
 import logging
 import re
-from typing import List, Tuple
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 
-import nltk
+from cachetools import TTLCache
 
+from app.config import get_settings
 from app.services.llm_service import llm_service
+from app.utils.token_utils import ensure_punkt
 from nltk.tokenize import sent_tokenize
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SPLIT_AFTER_LINE_PATTERN = re.compile(r"split_after:[^\n]*\n")
+# Coarse sentence boundary: terminal punctuation followed by whitespace and
+# something that looks like the start of a new sentence
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+HIGH_COMPLEXITY_THRESHOLD = 0.7
+MEDIUM_COMPLEXITY_THRESHOLD = 0.4
+
+# Target chunk sizes (in words) based on complexity
+HIGH_COMPLEXITY_CHUNK_SIZE = 300
+MEDIUM_COMPLEXITY_CHUNK_SIZE = 500
+LOW_COMPLEXITY_CHUNK_SIZE = 700
+
+
+@dataclass(slots=True)
+class TextStats:
+    complexity: float
+    sentences: List[str]
+    word_counts: List[int]
+
+
+def _greedy_group_breaks(word_counts: List[int], target_size: int) -> List[int]:
+    """
+    Return the sentence indices where a new chunk starts. A chunk is closed
+    when the next sentence would push it past target_size and it already
+    holds at least half the target.
+    """
+    breaks = []
+    min_size = target_size * 0.5
+    group_start = 0
+    current_word_count = 0
+
+    for i, count in enumerate(word_counts):
+        if (
+            current_word_count + count > target_size
+            and i > group_start
+            and current_word_count >= min_size
+        ):
+            breaks.append(i)
+            group_start = i
+            current_word_count = count
+        else:
+            current_word_count += count
 
-try:
-    nltk.data.find("tokenizers/punkt_tab")
-except LookupError:
-    nltk.download("punkt_tab")
+    return breaks
 
 
 class ChunkingService:
 
+    __slots__ = (
+        "chunking_prompt",
+        "prompt_prefix",
+        "prompt_suffix",
+        "suggestion_cache",
+        "batch_concurrency_limit",
+        "use_punkt",
+    )
+
     def __init__(self):
         self.chunking_prompt = self._get_chunking_prompt()
+        # Split around the single placeholder once; the identical prefix on every
+        # request also helps provider-side prompt caching
+        self.prompt_prefix, self.prompt_suffix = self.chunking_prompt.split("{document_text}")
+
+        # LLM split suggestions keyed by a hash of the full prompt, so re-ingesting
+        # an identical document skips the model call entirely
+        self.suggestion_cache = TTLCache(maxsize=10_000, ttl=86400)
 
-        self.COMPLEXITY_THRESHOLDS = {"high": 0.7, "medium": 0.4, "low": 0.0}
+        # Max number of concurrent LLM calls when chunking several documents
+        self.batch_concurrency_limit = 5
 
-        # Target chunk sizes based on complexity
-        self.SIZE_RANGES = {
-            "high_complexity": 300,
-            "medium_complexity": 500,
-            "low_complexity": 700,
-        }
+        # Grouping only needs coarse boundaries, so Punkt is opt-in
+        self.use_punkt = getattr(settings, 'CHUNKING_USE_PUNKT', False)
 
     def _get_chunking_prompt(self) -> str:
         return """
 You are an assistant specialized in splitting text into semantically consistent sections.
 
 <instructions>
-    <instruction>The text has been divided into chunks, each marked with <|start_chunk_X|> and <|end_chunk_X|> tags, where X is the chunk number</instruction>
+    <instruction>The text has been divided into chunks, each starting on a new line with a [X] prefix, where X is the chunk number</instruction>
     <instruction>Identify points where splits should occur, such that consecutive chunks of similar themes stay together</instruction>
     <instruction>Each chunk must be between 200 and 1000 words</instruction>
     <instruction>If chunks 1 and 2 belong together but chunk 3 starts a new topic, suggest a split after chunk 2</instruction>
@@ -52,15 +113,28 @@ This is the document text:
 Respond ONLY with the split_after format. No other text.
 """.strip()
 
+    def _analyze_text(self, text: str) -> TextStats:
+        """
+        Split text into sentences once and derive everything the chunking
+        passes need from that single tokenization.
+        """
+        sentences = self.split_into_sentences(text) if text.strip() else []
+        return TextStats(
+            complexity=self._score_complexity(text, sentences),
+            sentences=sentences,
+            word_counts=[self._approx_word_count(sentence) for sentence in sentences],
+        )
+
     def calculate_text_complexity(self, text: str) -> float:
+        return self._analyze_text(text).complexity
+
+    def _score_complexity(self, text: str, sentences: List[str]) -> float:
 
         if not text.strip():
             return 0.0
 
         try:
-            # Split into words and sentences
             words = re.findall(r"\b\w+\b", text.lower())
-            sentences = sent_tokenize(text)
 
             if not words or not sentences:
                 return 0.0
@@ -93,15 +167,19 @@ Respond ONLY with the split_after format. No other text.
             return 0.5  # Default to medium complexity
 
     def get_target_chunk_size(self, complexity_score: float) -> int:
-        if complexity_score >= self.COMPLEXITY_THRESHOLDS["high"]:
-            return self.SIZE_RANGES["high_complexity"]
-        elif complexity_score >= self.COMPLEXITY_THRESHOLDS["medium"]:
-            return self.SIZE_RANGES["medium_complexity"]
+        if complexity_score >= HIGH_COMPLEXITY_THRESHOLD:
+            return HIGH_COMPLEXITY_CHUNK_SIZE
+        elif complexity_score >= MEDIUM_COMPLEXITY_THRESHOLD:
+            return MEDIUM_COMPLEXITY_CHUNK_SIZE
         else:
-            return self.SIZE_RANGES["low_complexity"]
+            return LOW_COMPLEXITY_CHUNK_SIZE
 
     def split_into_sentences(self, text: str) -> List[str]:
+        if not self.use_punkt:
+            return [s.strip() for s in SENTENCE_BOUNDARY_PATTERN.split(text) if s.strip()]
+
         try:
+            ensure_punkt()
             sentences = sent_tokenize(text)
             return [s.strip() for s in sentences if s.strip()]
         except Exception as e:
@@ -111,46 +189,41 @@ Respond ONLY with the split_after format. No other text.
     def count_words(self, text: str) -> int:
         return len(re.findall(r"\b\w+\b", text))
 
-    def prepare_chunked_text(self, document_text: str) -> str:
+    def _approx_word_count(self, text: str) -> int:
+        # Whitespace split is close enough for target-size grouping and much
+        # cheaper than the regex in count_words
+        return len(text.split())
+
+    def _group_sentences(
+        self, sentences: List[str], word_counts: List[int], target_size: int
+    ) -> List[str]:
+        breaks = _greedy_group_breaks(word_counts, target_size)
+        bounds = [0, *breaks, len(sentences)]
+        return [
+            " ".join(sentences[start:end]).strip()
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
+    def prepare_chunked_text(self, document_text: str) -> Tuple[str, List[str]]:
+        """
+        Returns:
+            The marked-up text for the LLM and the chunks it was built from
+        """
         try:
-            # Calculate document complexity to determine target chunk size
-            complexity_score = self.calculate_text_complexity(document_text)
-            target_size = self.get_target_chunk_size(complexity_score)
+            # Sentences are reused for grouping, so the document is only tokenized once
+            stats = self._analyze_text(document_text)
+            target_size = self.get_target_chunk_size(stats.complexity)
 
             logger.info(
-                f"Document complexity: {complexity_score:.2f}, target chunk size: {target_size} words"
+                f"Document complexity: {stats.complexity:.2f}, target chunk size: {target_size} words"
             )
 
-            # Split document into sentences for better boundary preservation
-            sentences = self.split_into_sentences(document_text)
-
-            if not sentences:
+            if not stats.sentences:
                 logger.warning("No sentences found, falling back to original text")
-                return f"<|start_chunk_0>\n{document_text}<|end_chunk_0|>"
+                return f"[0] {document_text}\n", [document_text]
 
             # Group sentences into chunks based on target size
-            chunks = []
-            current_chunk = []
-            current_word_count = 0
-
-            for sentence in sentences:
-                sentence_word_count = self.count_words(sentence)
-
-                # If adding this sentence would exceed target size
-                if (
-                    current_word_count + sentence_word_count > target_size
-                    and current_chunk
-                    and current_word_count >= target_size * 0.5
-                ):
-                    chunks.append(" ".join(current_chunk))
-                    current_chunk = [sentence]
-                    current_word_count = sentence_word_count
-                else:
-                    current_chunk.append(sentence)
-                    current_word_count += sentence_word_count
-
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
+            chunks = self._group_sentences(stats.sentences, stats.word_counts, target_size)
 
             # If no chunks were created, use the whole document
             if not chunks:
@@ -160,15 +233,15 @@ Respond ONLY with the split_after format. No other text.
                 f"Created {len(chunks)} initial chunks with target size {target_size} words"
             )
 
-            chunked_text = ""
-            for i, chunk in enumerate(chunks):
-                chunked_text += f"<|start_chunk_{i}>\n{chunk.strip()}<|end_chunk_{i}|>"
-
-            return chunked_text
+            chunked_text = "".join(
+                f"[{i}] {chunk}\n"
+                for i, chunk in enumerate(chunks)
+            )
+            return chunked_text, chunks
 
         except Exception as e:
             logger.error(f"Error in prepare_chunked_text: {e}")
-            return f"<|start_chunk_0>\n{document_text}<|end_chunk_0|>"
+            return f"[0] {document_text}\n", [document_text]
 
     async def get_llm_chunking_suggestions(self, chunked_text: str) -> str:
         """
@@ -179,17 +252,64 @@ Respond ONLY with the split_after format. No other text.
         Returns:
             LLM response with split suggestions
         """
-        prompt = self.chunking_prompt.format(document_text=chunked_text)
-        return await llm_service.call_model(prompt)
+        prompt = self.prompt_prefix + chunked_text + self.prompt_suffix
+        cache_key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+        cached_response = self.suggestion_cache.get(cache_key)
+        if cached_response is not None:
+            logger.info("Using cached LLM chunking suggestions")
+            return cached_response
+
+        # The answer is a single split_after line, so stop reading as soon as
+        # it is complete instead of waiting for the model to finish decoding
+        response = ""
+        async with aclosing(llm_service.stream_model(prompt)) as stream:
+            async for text in stream:
+                response += text
+                split_line = SPLIT_AFTER_LINE_PATTERN.search(response)
+                if split_line:
+                    response = response[:split_line.end()]
+                    break
+
+        if response:
+            self.suggestion_cache[cache_key] = response
+        return response
+
+    def extract_chunks(self, chunked_text: str) -> List[str]:
+        # Markers are written in ascending order, so each chunk simply ends
+        # where the next marker starts; no backtracking regex needed. The
+        # search uses the whole "\n[N] " marker written by prepare_chunked_text,
+        # so lines such as "[1]: Smith 2020" inside a chunk don't end it early
+        if not chunked_text.startswith("[0] "):
+            return []
+
+        chunks = []
+        position = len("[0] ")
+        chunk_id = 0
+
+        while True:
+            next_marker = f"\n[{chunk_id + 1}] "
+            end = chunked_text.find(next_marker, position)
+            if end == -1:
+                chunks.append(chunked_text[position:].strip())
+                return chunks
+
+            chunks.append(chunked_text[position:end].strip())
+            position = end + len(next_marker)
+            chunk_id += 1
 
     def split_text_by_llm_suggestions(
-        self, chunked_text: str, llm_response: str
+        self,
+        chunked_text: str,
+        llm_response: str,
+        chunks: Optional[List[str]] = None
     ) -> List[str]:
         """
 
         Args:
             chunked_text: Text with chunk markers
             llm_response: LLM response with split suggestions
+            chunks: Chunks chunked_text was built from, in marker order
 
         Returns:
             List of text sections
@@ -208,9 +328,9 @@ Respond ONLY with the split_after format. No other text.
 
         logger.info(f"Split after chunks: {split_after}")
 
-        # Extract chunks using regex
-        chunk_pattern = r"<\|start_chunk_(\d+)\|?>(.*?)<\|end_chunk_\1\|>"
-        chunks = re.findall(chunk_pattern, chunked_text, re.DOTALL)
+        # Only parse the markers back out when the caller didn't keep the chunks
+        if chunks is None:
+            chunks = self.extract_chunks(chunked_text)
 
         if not chunks:
             logger.warning("No chunks found in text, falling back to size-based chunking")
@@ -220,21 +340,22 @@ Respond ONLY with the split_after format. No other text.
 
         if not split_after:
             logger.info("No splits suggested, using fallback size-based chunking")
-            original_text = "".join([chunk_text.strip() for _, chunk_text in chunks])
+            original_text = "".join(chunks)
             return self._fallback_size_based_chunking(original_text)
 
+        split_after_set = frozenset(split_after)
         sections = []
         current_section = []
 
-        for chunk_id, chunk_text in chunks:
+        for chunk_id, chunk_text in enumerate(chunks):
             current_section.append(chunk_text)
-            if int(chunk_id) in split_after:
-                sections.append("".join(current_section).strip())
+            if chunk_id in split_after_set:
+                sections.append("\n".join(current_section).strip())
                 current_section = []
 
         # Add the last section if it's not empty
         if current_section:
-            sections.append("".join(current_section).strip())
+            sections.append("\n".join(current_section).strip())
 
         max_words = 2000  # Maximum acceptable chunk size
         oversized_chunks = []
@@ -248,7 +369,7 @@ Respond ONLY with the split_after format. No other text.
             logger.warning(f"Found {len(oversized_chunks)} oversized chunks (max words: {max_words}). "
                          f"Oversized chunks: {oversized_chunks}")
             logger.info("Using fallback size-based chunking due to oversized chunks")
-            original_text = "".join([chunk_text.strip() for _, chunk_text in chunks])
+            original_text = "".join(chunks)
             return self._fallback_size_based_chunking(original_text)
 
         logger.info(f"Created {len(sections)} sections with acceptable sizes")
@@ -256,36 +377,15 @@ Respond ONLY with the split_after format. No other text.
 
     def _fallback_size_based_chunking(self, text: str) -> List[str]:
         try:
-            complexity_score = self.calculate_text_complexity(text)
-            target_size = self.get_target_chunk_size(complexity_score)
+            stats = self._analyze_text(text)
+            target_size = self.get_target_chunk_size(stats.complexity)
 
             logger.info(f"Using fallback chunking with target size: {target_size} words")
 
-            sentences = self.split_into_sentences(text)
-
-            if not sentences:
+            if not stats.sentences:
                 return [text]
 
-            chunks = []
-            current_chunk = []
-            current_word_count = 0
-
-            for sentence in sentences:
-                sentence_word_count = self.count_words(sentence)
-
-                if (current_word_count + sentence_word_count > target_size
-                    and current_chunk
-                    and current_word_count >= target_size * 0.5):
-
-                    chunks.append(" ".join(current_chunk).strip())
-                    current_chunk = [sentence]
-                    current_word_count = sentence_word_count
-                else:
-                    current_chunk.append(sentence)
-                    current_word_count += sentence_word_count
-
-            if current_chunk:
-                chunks.append(" ".join(current_chunk).strip())
+            chunks = self._group_sentences(stats.sentences, stats.word_counts, target_size)
 
             if not chunks:
                 chunks = [text]
@@ -312,13 +412,25 @@ Respond ONLY with the split_after format. No other text.
             )
 
             # set a section at each new line
-            chunked_text = self.prepare_chunked_text(document_text)
+            # A document under the smallest target size is a single chunk whatever
+            # the LLM says, so skip the round-trip
+            if self._approx_word_count(document_text) <= HIGH_COMPLEXITY_CHUNK_SIZE:
+                logger.info("Document fits in a single chunk, skipping LLM chunking")
+                return [document_text]
+
+            chunked_text, initial_chunks = self.prepare_chunked_text(document_text)
+
+            if len(initial_chunks) == 1:
+                logger.info("Only one initial chunk, skipping LLM chunking")
+                return initial_chunks
 
             # Get LLM suggestions on which sections to turn into chunks
             llm_response = await self.get_llm_chunking_suggestions(chunked_text)
             logger.info(f"LLM chunking response: {llm_response}")
 
-            chunks = self.split_text_by_llm_suggestions(chunked_text, llm_response)
+            chunks = self.split_text_by_llm_suggestions(
+                chunked_text, llm_response, initial_chunks
+            )
 
             logger.info(f"Successfully chunked document into {len(chunks)} chunks")
             return chunks
@@ -327,12 +439,34 @@ Respond ONLY with the split_after format. No other text.
             logger.error(f"Error chunking document: {e}")
             return [document_text]
 
+    async def chunk_documents_batch(self, document_texts: List[str]) -> List[List[str]]:
+        """
+        Chunk several documents with their LLM calls running concurrently.
+
+        Args:
+            document_texts: Raw document texts
+
+        Returns:
+            List of text chunks for each document, in input order
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency_limit)
+
+        async def chunk_with_limit(document_text: str) -> List[str]:
+            async with semaphore:
+                return await self.chunk_document(document_text)
+
+        logger.info(f"Chunking batch of {len(document_texts)} documents")
+        return await asyncio.gather(
+            *(chunk_with_limit(text) for text in document_texts)
+        )
+
     def cleanup(self) -> None:
         """
         Cleanup method to clear any cached data.
         """
         logger.info("Cleaning up ChunkingService")
         try:
+            self.suggestion_cache.clear()
             logger.debug("ChunkingService cleanup completed")
         except Exception as e:
             logger.warning(f"Error during ChunkingService cleanup: {e}")
@@ -1,18 +1,51 @@
+import asyncio
+import hashlib
 import logging
-from typing import List
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
+from app.config import get_settings
 from app.services.llm_service import llm_service
 from app.utils.token_utils import token_utils
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class ContextGenerationService:
 
     def __init__(self):
-        self.contextualizer_prompt = self._get_contextualizer_prompt()
-
-    def _get_contextualizer_prompt(self) -> str:
+        # Max number of chunks contextualized at once for a single document
+        self.max_concurrency = getattr(settings, 'LLM_MAX_CONCURRENCY', 8)
+
+        # LRU of contexts by (chunk digest, document digest), so re-processing
+        # an unchanged document doesn't send its chunks to the LLM again
+        self.cache_size = getattr(settings, 'CONTEXT_CACHE_SIZE', 1024)
+        self._context_cache: "OrderedDict[Tuple[bytes, bytes], str]" = OrderedDict()
+
+        # Truncated documents, their token counts and prompt prefixes by
+        # document digest. Only the few documents being contextualized at
+        # once need an entry; evicted ones are freed
+        self.document_cache_size = 4
+        self._document_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
+    @cached_property
+    def prompt_parts(self) -> Tuple[str, str, str]:
+        # Everything up to the chunk depends only on the document, so every chunk
+        # of a document shares a byte-identical prefix that providers can cache.
+        # The template is split around its slots once, so building a prompt is
+        # plain concatenation instead of re-parsing the template with str.format
+        head, _, rest = self.contextualizer_prompt.partition("{document}")
+        middle, _, suffix = rest.partition("{chunk}")
+        return head, middle, suffix
+
+    @cached_property
+    def template_tokens(self) -> int:
+        return token_utils.count_tokens("".join(self.prompt_parts))
+
+    @cached_property
+    def contextualizer_prompt(self) -> str:
         return """
 You are an assistant specialized in analyzing document chunks and providing relevant context.
 
@@ -40,18 +73,72 @@ Here is the chunk to contextualize:
 Respond only with the succinct context for this chunk. Do not mention it is a chunk or that you are providing context.
 """.strip()
 
-    async def generate_context_for_chunk(self, chunk: str, document: str) -> str:
-        try:
-            truncated_document = self._prepare_document_for_context(document, chunk)
+    def _get_prompt_prefix(self, document: str) -> str:
+        head, middle, _ = self.prompt_parts
+        return f"{head}{document}{middle}"
+
+    def _build_prompt(self, document: str, chunk: str, prefix: Optional[str] = None) -> str:
+        if prefix is None:
+            prefix = self._get_prompt_prefix(document)
+        return prefix + chunk + self.prompt_parts[2]
+
+    def _document_entry(self, digest: bytes) -> Dict[str, Any]:
+        entry = self._document_cache.get(digest)
+        if entry is None:
+            entry = self._document_cache[digest] = {}
+            if len(self._document_cache) > self.document_cache_size:
+                self._document_cache.popitem(last=False)
+        else:
+            self._document_cache.move_to_end(digest)
+        return entry
+
+    def _document_value(
+        self, digest: bytes, name: str, compute: Callable[[str], Any], document: str
+    ) -> "asyncio.Future":
+        """
+        The shared future computing one per-document value off the event
+        loop, so concurrent chunks of a document wait on a single computation.
+        Callers await it through asyncio.shield, so a cancelled chunk doesn't
+        cancel it for the others; a cancelled or failed one is recomputed
+        """
+        entry = self._document_entry(digest)
+        future = entry.get(name)
+        if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+            future = entry[name] = asyncio.ensure_future(asyncio.to_thread(compute, document))
+        return future
 
-            prompt = self.contextualizer_prompt.format(document=truncated_document, chunk=chunk)
+    async def generate_context_for_chunk(self, chunk: str, document: str) -> str:
+        document_digest = self._document_digest(document)
+        cache_key = (hashlib.sha256(chunk.encode()).digest(), document_digest)
+        cached = self._context_cache.get(cache_key)
+        if cached is not None:
+            self._context_cache.move_to_end(cache_key)
+            return cached
 
-            prompt_tokens = token_utils.count_tokens(prompt)
+        try:
+            # Truncation and its token count depend only on the document, so they
+            # are computed once and shared by every chunk of that document.
+            # tiktoken releases the GIL, so the work runs off the event loop
+            truncated_document, document_tokens = await asyncio.shield(self._document_value(
+                document_digest, "prepared", self._prepare_document_for_context, document
+            ))
+            prefix_name = "prefix"
+
+            prompt_tokens = self.template_tokens + document_tokens + token_utils.count_tokens(chunk)
             if prompt_tokens > 6000:
                 logger.warning(f"Prompt has {prompt_tokens} tokens, applying additional truncation")
-                max_doc_tokens = 3000
-                truncated_document = token_utils.smart_document_truncation(document, max_doc_tokens)
-                prompt = self.contextualizer_prompt.format(document=truncated_document, chunk=chunk)
+                truncated_document = await asyncio.shield(self._document_value(
+                    document_digest, "shrunk", self._shrink_document_for_context, document
+                ))
+                prefix_name = "shrunk_prefix"
+
+            # The prefix is shared by every chunk of the document
+            entry = self._document_entry(document_digest)
+            prefix = entry.get(prefix_name)
+            if prefix is None:
+                prefix = entry[prefix_name] = self._get_prompt_prefix(truncated_document)
+
+            prompt = self._build_prompt(truncated_document, chunk, prefix)
 
             context = await llm_service.call_model(prompt)
 
@@ -60,27 +147,38 @@ Respond only with the succinct context for this chunk. Do not mention it is a ch
             logger.debug(
                 f"Generated context for chunk (length {len(chunk)}): {context[:100]}..."
             )
+            self._cache_context(cache_key, context)
             return context
 
         except Exception as e:
             logger.error(f"Error generating context for chunk: {e}")
             return self._create_fallback_context(chunk)
 
-    def _prepare_document_for_context(self, document: str, chunk: str) -> str:
+    def _document_digest(self, document: str) -> bytes:
+        return hashlib.sha256(document.encode()).digest()
+
+    def _cache_context(self, key: Tuple[bytes, bytes], context: str) -> None:
+        if self.cache_size <= 0:
+            return
+        self._context_cache[key] = context
+        self._context_cache.move_to_end(key)
+        if len(self._context_cache) > self.cache_size:
+            self._context_cache.popitem(last=False)
+
+    def _prepare_document_for_context(self, document: str) -> Tuple[str, int]:
         """
         Args:
             document: Full document text
-            chunk: The specific chunk being contextualized
 
         Returns:
-            Truncated document for context generation
+            Truncated document for context generation and its token count
         """
         max_document_tokens = 4000
 
         document_tokens = token_utils.count_tokens(document)
 
         if document_tokens <= max_document_tokens:
-            return document
+            return document, document_tokens
 
         logger.info(f"Document has {document_tokens} tokens, truncating for context generation")
 
@@ -93,7 +191,11 @@ Respond only with the succinct context for this chunk. Do not mention it is a ch
         final_tokens = token_utils.count_tokens(truncated_document)
         logger.info(f"Truncated document to {final_tokens} tokens for context generation")
 
-        return truncated_document
+        return truncated_document, final_tokens
+
+    def _shrink_document_for_context(self, document: str) -> str:
+        max_doc_tokens = 3000
+        return token_utils.smart_document_truncation(document, max_doc_tokens)
 
     def _validate_and_truncate_context(self, context: str) -> str:
         if not context or not context.strip():
@@ -111,69 +213,109 @@ Respond only with the succinct context for this chunk. Do not mention it is a ch
         return context
 
     def _create_fallback_context(self, chunk: str) -> str:
-        sentences = chunk.split('.')
-        if sentences and len(sentences[0]) > 10:
-            return f"This content discusses {sentences[0][:100].strip().lower()}."
+        end = chunk.find('.')
+        first_sentence = chunk if end < 0 else chunk[:end]
+        if len(first_sentence) > 10:
+            return f"This content discusses {first_sentence[:100].strip().lower()}."
         else:
             return f"This content covers information from the document."
 
     async def generate_contexts_for_chunks(
         self, chunks: List[str], document: str
     ) -> List[str]:
-        contexts = []
-        total_chunks = len(chunks)
-
-        logger.info(f"Generating contexts for {total_chunks} chunks")
-
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{total_chunks}")
-
-            context = await self.generate_context_for_chunk(chunk, document)
-            contexts.append(context)
+        contexts = [
+            context async for context in self.stream_contexts_for_chunks(chunks, document)
+        ]
 
         logger.info(f"Successfully generated {len(contexts)} contexts")
         return contexts
 
+    async def stream_contexts_for_chunks(
+        self, chunks: List[str], document: str
+    ) -> AsyncIterator[str]:
+        """
+        Yield each chunk's context in chunk order as soon as it and every
+        earlier context are ready, while later chunks are still being processed.
+        """
+        total_chunks = len(chunks)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Repeated chunks (headers, footers, boilerplate) get the same context,
+        # so each distinct chunk is sent to the LLM only once
+        unique_index = {}
+        chunk_indices = [unique_index.setdefault(chunk, len(unique_index)) for chunk in chunks]
+        unique_chunks = list(unique_index)
+        unique_total = len(unique_chunks)
+
+        logger.info(f"Generating contexts for {total_chunks} chunks ({unique_total} unique)")
+
+        async def generate_with_limit(i: int, chunk: str) -> str:
+            async with semaphore:
+                logger.info(f"Processing chunk {i+1}/{unique_total}")
+                try:
+                    return await self.generate_context_for_chunk(chunk, document)
+                except Exception as e:
+                    logger.error(f"Error generating context for chunk: {e}")
+                    return self._create_fallback_context(chunk)
+
+        tasks = [
+            asyncio.create_task(generate_with_limit(i, chunk))
+            for i, chunk in enumerate(unique_chunks)
+        ]
+        try:
+            for index in chunk_indices:
+                yield await tasks[index]
+        finally:
+            # The consumer may stop early; don't leave LLM calls running
+            for task in tasks:
+                task.cancel()
+
     async def create_contextualized_chunks(
         self, chunks: List[str], document: str
     ) -> List[str]:
-        contexts = await self.generate_contexts_for_chunks(chunks, document)
+        contextualized_chunks = [
+            contextualized_chunk
+            async for contextualized_chunk in self.stream_contextualized_chunks(chunks, document)
+        ]
+
+        logger.info(f"Created {len(contextualized_chunks)} contextualized chunks")
+        return contextualized_chunks
 
-        contextualized_chunks = []
-        for chunk, context in zip(chunks, contexts):
+    async def stream_contextualized_chunks(
+        self, chunks: List[str], document: str
+    ) -> AsyncIterator[str]:
+        """
+        Yield contextualized chunks in order as their contexts arrive, so callers
+        can start embedding early chunks while later ones are still at the LLM.
+        """
+        i = 0
+        async for context in self.stream_contexts_for_chunks(chunks, document):
+            chunk = chunks[i]
+            i += 1
             if context.strip():
-                contextualized_chunk = (
-                    f"<chunk_context>{context}</chunk_context>\n<chunk>{chunk}</chunk>"
-                )
+                yield f"<chunk_context>{context}</chunk_context>\n<chunk>{chunk}</chunk>"
             else:
                 # If no context generated, just wrap the chunk
-                contextualized_chunk = f"<chunk>{chunk}</chunk>"
-
-            contextualized_chunks.append(contextualized_chunk)
-
-        logger.info(f"Created {len(contextualized_chunks)} contextualized chunks")
-        return contextualized_chunks
+                yield f"<chunk>{chunk}</chunk>"
 
     def extract_chunk_content(self, contextualized_chunk: str) -> str:
-        import re
-
-        chunk_match = re.search(
-            r"<chunk>(.*?)</chunk>", contextualized_chunk, re.DOTALL
-        )
-        if chunk_match:
-            return chunk_match.group(1).strip()
+        start = contextualized_chunk.find("<chunk>")
+        if start >= 0:
+            start += len("<chunk>")
+            end = contextualized_chunk.find("</chunk>", start)
+            if end >= 0:
+                return contextualized_chunk[start:end].strip()
 
         # return the whole text if no chunk found
         return contextualized_chunk
 
     def extract_chunk_context(self, contextualized_chunk: str) -> str:
-        import re
-
-        context_match = re.search(
-            r"<chunk_context>(.*?)</chunk_context>", contextualized_chunk, re.DOTALL
-        )
-        if context_match:
-            return context_match.group(1).strip()
+        start = contextualized_chunk.find("<chunk_context>")
+        if start >= 0:
+            start += len("<chunk_context>")
+            end = contextualized_chunk.find("</chunk_context>", start)
+            if end >= 0:
+                return contextualized_chunk[start:end].strip()
 
         # No context found
         return ""
@@ -181,8 +323,17 @@ Respond only with the succinct context for this chunk. Do not mention it is a ch
     def cleanup(self) -> None:
         logger.info("Cleaning up ContextGenerationService")
         try:
+            self._context_cache.clear()
+            self._document_cache.clear()
             logger.debug("ContextGenerationService cleanup completed")
         except Exception as e:
             logger.warning(f"Error during ContextGenerationService cleanup: {e}")
 
-context_generation_service = ContextGenerationService()
+# Constructed on first use by get_context_generation_service
+_context_generation_service: Optional[ContextGenerationService] = None
+
+def get_context_generation_service() -> ContextGenerationService:
+    global _context_generation_service
+    if _context_generation_service is None:
+        _context_generation_service = ContextGenerationService()
+    return _context_generation_service
@@ -1,33 +1,221 @@
-import json
+import asyncio
 import logging
+import os
+import sys
+import uuid
+import warnings
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Tuple, Union
 
 import asyncpg
 import numpy as np
+import orjson
 
 from app.config import get_settings
+from app.utils.quant import (
+    decode_vector,
+    decode_vector_matrix,
+    encode_vectors,
+    has_dimension,
+    vector_dimension,
+)
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+CHUNK_COLUMNS = [
+    "id", "documentId", "organizationId", "content", "metadata", "isDeleted",
+    "createdAt", "updatedAt",
+]
+EMBEDDING_COLUMNS = [
+    "id", "chunkId", "documentId", "organizationId", "vector", "isDeleted",
+    "createdAt", "updatedAt",
+]
+ACCESS_DENIAL_COLUMNS = [
+    "id", "organizationId", "userId", "searchQuery", "chunkId", "documentId",
+    "groupId", "accessLevel", "denialReason", "similarity", "metadata",
+    "timestamp",
+]
+# Batches at or above this size are written with COPY instead of executemany
+COPY_THRESHOLD = 32
+# Access denials are buffered and written at most this often, in batches of
+# up to DENIAL_BATCH_SIZE rows
+DENIAL_FLUSH_INTERVAL = 0.1
+DENIAL_BATCH_SIZE = 500
+
+
+def _build_insert_query(table: str, columns: List[str]) -> str:
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    return f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})'
+
+
+# Built once so every executemany on a connection hits asyncpg's statement cache
+INSERT_QUERIES = {
+    "Chunk": _build_insert_query("Chunk", CHUNK_COLUMNS),
+    "Embedding": _build_insert_query("Embedding", EMBEDDING_COLUMNS),
+    "AccessDenialLog": _build_insert_query("AccessDenialLog", ACCESS_DENIAL_COLUMNS),
+}
+
+MARK_CHUNKS_DELETED_QUERY = """
+    UPDATE "Chunk"
+    SET "isDeleted" = true, "updatedAt" = NOW()
+    WHERE id = ANY($1) AND "organizationId" = $2
+"""
+MARK_EMBEDDINGS_DELETED_QUERY = """
+    UPDATE "Embedding"
+    SET "isDeleted" = true, "updatedAt" = NOW()
+    WHERE id = ANY($1) AND "organizationId" = $2
+"""
+# Maximum number of ids per soft-delete UPDATE
+DELETE_BATCH_SIZE = 10_000
+
+ORGANIZATION_DOCUMENTS_QUERY = """
+    SELECT
+        id,
+        title,
+        "accessLevel",
+        "groupId",
+        "restrictedToUsers",
+        metadata
+    FROM "Document"
+    WHERE "organizationId" = $1 AND "isDeleted" = false
+"""
+
+# Document columns are fetched once per document by ORGANIZATION_DOCUMENTS_QUERY
+# rather than repeated on every chunk row
+ORGANIZATION_CHUNKS_QUERY = """
+    SELECT
+        c.id as chunk_id,
+        c.content,
+        c.metadata as chunk_metadata,
+        c."documentId" as document_id,
+        e.vector,
+        e.id as embedding_id
+    FROM "Chunk" c
+    LEFT JOIN "Embedding" e ON e."chunkId" = c.id
+    WHERE
+        c."organizationId" = $1
+        AND c."isDeleted" = false
+        AND (e."isDeleted" = false OR e."isDeleted" IS NULL)
+    ORDER BY c."documentId", c.id
+"""
+# Column positions in ORGANIZATION_CHUNKS_QUERY rows. The organization-wide
+# loops index records by position, which skips asyncpg's name lookup per field
+(
+    ORG_CHUNK_ID,
+    ORG_CONTENT,
+    ORG_CHUNK_METADATA,
+    ORG_DOCUMENT_ID,
+    ORG_VECTOR,
+    ORG_EMBEDDING_ID,
+) = range(6)
+
+# Index builds only read embedded chunks and never need the content, so the
+# inner join lets Postgres drive the scan from the Embedding table
+ORGANIZATION_EMBEDDINGS_QUERY = """
+    SELECT
+        c.id as chunk_id,
+        c.metadata as chunk_metadata,
+        c."documentId" as document_id,
+        e.vector
+    FROM "Chunk" c
+    JOIN "Embedding" e ON e."chunkId" = c.id
+    WHERE
+        c."organizationId" = $1
+        AND c."isDeleted" = false
+        AND e."isDeleted" = false
+        AND e.vector IS NOT NULL
+    ORDER BY c."documentId", c.id
+"""
+(
+    EMB_CHUNK_ID,
+    EMB_CHUNK_METADATA,
+    EMB_DOCUMENT_ID,
+    EMB_VECTOR,
+) = range(4)
+
+ORGANIZATION_CHUNK_COUNTS_QUERY = """
+    SELECT
+        COUNT(*) as chunk_count,
+        COUNT(DISTINCT c."documentId") as document_count
+    FROM "Chunk" c
+    JOIN "Document" d ON d.id = c."documentId"
+    WHERE
+        c."organizationId" = $1
+        AND c."isDeleted" = false
+        AND d."isDeleted" = false
+"""
+
+
+# jsonb binary format is a version byte followed by the JSON text
+JSONB_FORMAT_VERSION = b"\x01"
+JSONB_DUMP_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _encode_jsonb(value: Any) -> bytes:
+    return JSONB_FORMAT_VERSION + orjson.dumps(value, option=JSONB_DUMP_OPTIONS)
+
+
+def _decode_jsonb(data: bytes) -> Any:
+    return orjson.loads(data[1:])
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # jsonb parameters take Python objects and jsonb columns come back decoded,
+    # so metadata is serialized once by orjson instead of json.dumps plus a cast
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary",
+    )
+
 
 class DatabaseService:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self.quantize_embeddings = getattr(settings, 'EMBEDDING_QUANTIZE_INT8', True)
+        self._denial_queue: Optional[asyncio.Queue] = None
+        self._denial_task: Optional[asyncio.Task] = None
+        self._denial_write: Optional[asyncio.Future] = None
 
     async def connect(self):
         if not self.pool:
             try:
+                min_size, max_size = self._pool_size()
                 self.pool = await asyncpg.create_pool(
-                    settings.DATABASE_URL, min_size=5, max_size=20, command_timeout=60
+                    settings.DATABASE_URL,
+                    min_size=min_size,
+                    max_size=max_size,
+                    max_queries=getattr(settings, 'DB_POOL_MAX_QUERIES', 50000),
+                    max_inactive_connection_lifetime=getattr(
+                        settings, 'DB_POOL_MAX_INACTIVE_LIFETIME', 300.0
+                    ),
+                    command_timeout=60,
+                    # JIT compilation only adds latency to these short queries
+                    server_settings={"jit": "off"},
+                    init=_init_connection,
+                    # Every query here is a fixed SQL string, so each connection
+                    # prepares it once and reuses the plan for its whole lifetime
+                    statement_cache_size=getattr(settings, 'DB_STATEMENT_CACHE_SIZE', 1024),
+                    max_cached_statement_lifetime=0,
                 )
                 logger.info("Database connection pool created successfully")
             except Exception as e:
                 logger.error(f"Failed to create database connection pool: {e}")
                 raise
 
+    def _pool_size(self) -> Tuple[int, int]:
+        # (2 * cores) + 1 unless configured explicitly
+        max_size = getattr(settings, 'DB_POOL_MAX_SIZE', None) or (os.cpu_count() or 4) * 2 + 1
+        min_size = getattr(settings, 'DB_POOL_MIN_SIZE', None) or max(2, max_size // 4)
+        return min(min_size, max_size), max_size
+
     async def disconnect(self):
+        await self.flush_access_denials()
         if self.pool:
             await self.pool.close()
             self.pool = None
@@ -39,95 +227,98 @@ class DatabaseService:
         """
         Fetch all non-deleted chunks and their embeddings for an organization.
 
+        Deprecated: builds one dict per chunk. Index builds should use the
+        columnar get_embedding_matrix_for_organization, and per-chunk consumers
+        iter_chunks_and_embeddings_for_organization.
+
         Returns:
-            List of dicts containing chunk data with embeddings and metadata
+            List of dicts containing chunk data with embeddings and metadata.
+            Embeddings are row views into one contiguous float32 matrix.
         """
-        query = """
-            SELECT
-                c.id as chunk_id,
-                c.content,
-                c.metadata as chunk_metadata,
-                e.vector,
-                e.id as embedding_id,
-                d.id as document_id,
-                d.title as document_title,
-                d."accessLevel",
-                d."groupId",
-                d."restrictedToUsers",
-                d.metadata as document_metadata
-            FROM "Chunk" c
-            INNER JOIN "Document" d ON c."documentId" = d.id
-            LEFT JOIN "Embedding" e ON e."chunkId" = c.id
-            WHERE
-                c."organizationId" = $1
-                AND c."isDeleted" = false
-                AND d."isDeleted" = false
-                AND (e."isDeleted" = false OR e."isDeleted" IS NULL)
-            ORDER BY d.id, c.id
+        warnings.warn(
+            "get_chunks_and_embeddings_for_organization is deprecated; use "
+            "get_embedding_matrix_for_organization or "
+            "iter_chunks_and_embeddings_for_organization",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        results = []
+        vector_indices = []
+        vector_bytes_list = []
+        dimension = 0
+
+        async for row, document_metadata in self._iter_organization_rows(organization_id):
+            result = self._row_to_result(row, document_metadata, decode_embedding=False)
+
+            vector_bytes = row[ORG_VECTOR]
+            if vector_bytes:
+                if not vector_bytes_list:
+                    dimension = vector_dimension(vector_bytes)
+                if vector_dimension(vector_bytes) == dimension:
+                    vector_indices.append(len(results))
+                    vector_bytes_list.append(vector_bytes)
+                else:
+                    result["embedding"] = decode_vector(vector_bytes)
+
+            results.append(result)
+
+        if vector_bytes_list:
+            embeddings = decode_vector_matrix(vector_bytes_list, dimension)
+            for row_index, result_index in enumerate(vector_indices):
+                results[result_index]["embedding"] = embeddings[row_index]
+
+        logger.info(
+            f"Fetched {len(results)} chunks for organization {organization_id}"
+        )
+        return results
+
+    async def iter_chunks_and_embeddings_for_organization(
+        self, organization_id: str, batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
+        Stream non-deleted chunks and their embeddings for an organization
+        through a server-side cursor instead of buffering the full result.
 
-        try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch(query, organization_id)
+        Args:
+            organization_id: Organization to fetch chunks for
+            batch_size: Number of rows prefetched per cursor round-trip
 
-                results = []
-                for row in rows:
-                    # Prepare permission metadata for the search indexes
-                    permission_metadata = {
-                        "accessLevel": row["accessLevel"],
-                        "groupId": row["groupId"],
-                        "restrictedToUsers": row["restrictedToUsers"] or [],
-                    }
-
-                    chunk_metadata = row["chunk_metadata"]
-                    if isinstance(chunk_metadata, str):
-                        try:
-                            chunk_metadata = json.loads(chunk_metadata)
-                        except (json.JSONDecodeError, TypeError):
-                            chunk_metadata = {}
-                    elif chunk_metadata is None:
-                        chunk_metadata = {}
-
-                    document_metadata = row["document_metadata"]
-                    if isinstance(document_metadata, str):
-                        try:
-                            document_metadata = json.loads(document_metadata)
-                        except (json.JSONDecodeError, TypeError):
-                            document_metadata = {}
-                    elif document_metadata is None:
-                        document_metadata = {}
-
-                    # Combine all metadata
-                    metadata = {
-                        **chunk_metadata,
-                        **document_metadata,
-                        "document_title": row["document_title"],
-                        **permission_metadata,
-                    }
-
-                    result = {
-                        "chunk_id": row["chunk_id"],
-                        "content": row["content"],
-                        "document_id": row["document_id"],
-                        "metadata": metadata,
-                    }
-
-                    # Convert embedding vector from bytes to numpy array if present
-                    if row["vector"]:
-                        result["embedding"] = np.frombuffer(
-                            row["vector"], dtype=np.float32
-                        )
-                        result["embedding_id"] = row["embedding_id"]
-                    else:
-                        result["embedding"] = None
-                        result["embedding_id"] = None
-
-                    results.append(result)
+        Yields:
+            Dicts containing chunk data with embeddings and metadata
+        """
+        async for row, document_metadata in self._iter_organization_rows(
+            organization_id, batch_size
+        ):
+            yield self._row_to_result(row, document_metadata)
 
-                logger.info(
-                    f"Fetched {len(results)} chunks for organization {organization_id}"
-                )
-                return results
+    async def _iter_organization_rows(
+        self,
+        organization_id: str,
+        batch_size: int = 1000,
+        query: str = ORGANIZATION_CHUNKS_QUERY,
+        document_index: int = ORG_DOCUMENT_ID,
+    ) -> AsyncIterator[Tuple[asyncpg.Record, Dict[str, Any]]]:
+        """
+        Args:
+            query: Organization chunk query to stream
+            document_index: Position of the document id in the query's rows
+
+        Yields:
+            Each chunk row of the organization with its document's metadata
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                documents = await self._fetch_organization_documents(conn, organization_id)
+
+                async with conn.transaction():
+                    async for row in conn.cursor(
+                        query, organization_id, prefetch=batch_size
+                    ):
+                        document_metadata = documents.get(row[document_index])
+                        if document_metadata is None:
+                            # Chunk of a deleted document
+                            continue
+                        yield row, document_metadata
 
         except Exception as e:
             logger.error(
@@ -135,20 +326,243 @@ class DatabaseService:
             )
             raise
 
+    async def get_embedding_matrix_for_organization(
+        self,
+        organization_id: str,
+        batch_size: int = 1000,
+        include_unembedded: bool = False,
+        metadata_fields: Optional[FrozenSet[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetch an organization's embeddings as one contiguous float32 matrix
+        with parallel per-row lists, instead of one small array per chunk.
+
+        Args:
+            organization_id: Organization to fetch embeddings for
+            batch_size: Number of rows prefetched per cursor round-trip
+            include_unembedded: Stream chunks without embeddings too and count
+                them on the way, instead of reading only embedded chunks and
+                counting with a separate aggregate query
+            metadata_fields: Keys to keep in each row's metadata. None keeps the
+                full merged chunk and document metadata
+
+        Returns:
+            Dict with an (N, D) "embeddings" matrix, "chunk_ids", "document_ids"
+            and "metadata" lists aligned with its rows, plus "chunk_count" and
+            "document_count" covering chunks without embeddings as well
+        """
+        pending_vectors = []
+        chunk_ids = []
+        document_ids = []
+        metadata_list = []
+        all_document_ids = set()
+        chunk_count = 0
+        document_count = None
+        # Without a configured dimension the first well-formed row sets it
+        dimension = getattr(settings, 'EMBEDDING_DIMENSION', None) or 0
+        embeddings = None
+
+        if include_unembedded:
+            query = ORGANIZATION_CHUNKS_QUERY
+            chunk_index, metadata_index, document_index, vector_index = (
+                ORG_CHUNK_ID, ORG_CHUNK_METADATA, ORG_DOCUMENT_ID, ORG_VECTOR
+            )
+        else:
+            query = ORGANIZATION_EMBEDDINGS_QUERY
+            chunk_index, metadata_index, document_index, vector_index = (
+                EMB_CHUNK_ID, EMB_CHUNK_METADATA, EMB_DOCUMENT_ID, EMB_VECTOR
+            )
+            async with self.pool.acquire() as conn:
+                counts = await conn.fetchrow(
+                    ORGANIZATION_CHUNK_COUNTS_QUERY, organization_id
+                )
+            chunk_count = counts["chunk_count"]
+            document_count = counts["document_count"]
+
+        # The chunk count bounds the number of embeddings, so the matrix is
+        # usually allocated once; otherwise it grows by doubling
+        initial_capacity = chunk_count or batch_size
+
+        def flush_vectors():
+            # Decode the pending rows straight into the matrix so their bytes
+            # are released batch by batch instead of all at the end
+            nonlocal embeddings
+            filled = len(chunk_ids) - len(pending_vectors)
+            needed = len(chunk_ids)
+            if embeddings is None or len(embeddings) < needed:
+                capacity = max(needed, initial_capacity, 2 * filled)
+                grown = np.empty((capacity, dimension), dtype=np.float32)
+                if filled:
+                    grown[:filled] = embeddings[:filled]
+                embeddings = grown
+            decode_vector_matrix(pending_vectors, dimension, out=embeddings[filled:needed])
+            pending_vectors.clear()
+
+        previous_document_id = None
+        async for row, document_metadata in self._iter_organization_rows(
+            organization_id, batch_size, query, document_index
+        ):
+            document_id = row[document_index]
+            # Rows arrive grouped by document: reuse one id string per document
+            # rather than keeping a fresh copy for every chunk
+            if document_id == previous_document_id:
+                document_id = previous_document_id
+            previous_document_id = document_id
+            if include_unembedded:
+                chunk_count += 1
+                all_document_ids.add(document_id)
+
+            vector_bytes = row[vector_index]
+            if not vector_bytes:
+                continue
+            row_dimension = dimension or vector_dimension(vector_bytes)
+            if not row_dimension or not has_dimension(vector_bytes, row_dimension):
+                logger.warning(
+                    f"Skipping embedding for chunk {row[chunk_index]}: "
+                    f"{len(vector_bytes)} bytes is not a {row_dimension}-dimensional vector"
+                )
+                continue
+            dimension = row_dimension
+
+            pending_vectors.append(vector_bytes)
+            chunk_ids.append(row[chunk_index])
+            document_ids.append(document_id)
+            if metadata_fields is None:
+                # Document metadata takes precedence over chunk metadata
+                metadata_list.append({**(row[metadata_index] or {}), **document_metadata})
+            else:
+                metadata_list.append(
+                    self._project_metadata(row[metadata_index], document_metadata, metadata_fields)
+                )
+            if len(pending_vectors) >= batch_size:
+                flush_vectors()
+
+        if pending_vectors:
+            flush_vectors()
+        if embeddings is None:
+            embeddings = np.empty((0, dimension), dtype=np.float32)
+        elif len(embeddings) > len(chunk_ids):
+            # Trim the unused capacity in place
+            embeddings.resize((len(chunk_ids), dimension), refcheck=False)
+        if document_count is None:
+            document_count = len(all_document_ids)
+
+        logger.info(
+            f"Fetched {len(chunk_ids)} embeddings ({chunk_count} chunks) "
+            f"for organization {organization_id}"
+        )
+
+        return {
+            "embeddings": embeddings,
+            "chunk_ids": chunk_ids,
+            "document_ids": document_ids,
+            "metadata": metadata_list,
+            "chunk_count": chunk_count,
+            "document_count": document_count,
+        }
+
+    async def _fetch_organization_documents(
+        self, conn: asyncpg.Connection, organization_id: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            Map of document id to the metadata every chunk of that document inherits
+        """
+        rows = await conn.fetch(ORGANIZATION_DOCUMENTS_QUERY, organization_id)
+
+        return {
+            row["id"]: self._build_document_metadata(row["metadata"], row["title"], row)
+            for row in rows
+        }
+
+    def _build_document_metadata(
+        self, metadata: Any, title: Optional[str], row: asyncpg.Record
+    ) -> Dict[str, Any]:
+        # Access levels and group ids repeat across many documents, so share
+        # one string object per value instead of one per document
+        access_level = row["accessLevel"]
+        group_id = row["groupId"]
+
+        # Prepare permission metadata for the search indexes
+        permission_metadata = {
+            "accessLevel": sys.intern(access_level) if access_level else access_level,
+            "groupId": sys.intern(group_id) if group_id else group_id,
+            "restrictedToUsers": row["restrictedToUsers"] or [],
+        }
+
+        return {
+            **(metadata or {}),
+            "document_title": title,
+            **permission_metadata,
+        }
+
+    def _row_metadata(
+        self, row: asyncpg.Record, document_metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        # Document metadata takes precedence over chunk metadata; jsonb columns
+        # arrive already decoded by the connection's codec
+        return {**(row["chunk_metadata"] or {}), **document_metadata}
+
+    def _project_metadata(
+        self,
+        chunk_metadata: Optional[Dict[str, Any]],
+        document_metadata: Dict[str, Any],
+        fields: FrozenSet[str],
+    ) -> Dict[str, Any]:
+        # Same precedence as _row_metadata without building the full merge
+        projected = {}
+        for field in fields:
+            if field in document_metadata:
+                projected[field] = document_metadata[field]
+            elif chunk_metadata and field in chunk_metadata:
+                projected[field] = chunk_metadata[field]
+        return projected
+
+    def _row_to_result(
+        self,
+        row: asyncpg.Record,
+        document_metadata: Dict[str, Any],
+        decode_embedding: bool = True,
+    ) -> Dict[str, Any]:
+        result = {
+            "chunk_id": row["chunk_id"],
+            "content": row["content"],
+            "document_id": row["document_id"],
+            "metadata": self._row_metadata(row, document_metadata),
+        }
+
+        # Convert embedding vector from bytes to numpy array if present;
+        # batch callers leave it None and fill it from a shared matrix
+        if row["vector"]:
+            result["embedding"] = decode_vector(row["vector"]) if decode_embedding else None
+            result["embedding_id"] = row["embedding_id"]
+        else:
+            result["embedding"] = None
+            result["embedding_id"] = None
+
+        return result
+
     async def get_organization_stats(self, organization_id: str) -> Dict[str, Any]:
+        # Independent counts instead of joining Document x Chunk x Embedding
+        # and deduplicating the product with COUNT(DISTINCT)
         query = """
             SELECT
-                COUNT(DISTINCT d.id) as document_count,
-                COUNT(DISTINCT c.id) as chunk_count,
-                COUNT(DISTINCT e.id) as embedding_count,
+                (
+                    SELECT COUNT(*) FROM "Document"
+                    WHERE "organizationId" = o.id AND "isDeleted" = false
+                ) as document_count,
+                (
+                    SELECT COUNT(*) FROM "Chunk"
+                    WHERE "organizationId" = o.id AND "isDeleted" = false
+                ) as chunk_count,
+                (
+                    SELECT COUNT(*) FROM "Embedding"
+                    WHERE "organizationId" = o.id AND "isDeleted" = false
+                ) as embedding_count,
                 o."lastIndexUpdate",
                 o."lastDataChange"
             FROM "Organization" o
-            LEFT JOIN "Document" d ON d."organizationId" = o.id AND d."isDeleted" = false
-            LEFT JOIN "Chunk" c ON c."documentId" = d.id AND c."isDeleted" = false
-            LEFT JOIN "Embedding" e ON e."chunkId" = c.id AND e."isDeleted" = false
             WHERE o.id = $1
-            GROUP BY o.id, o."lastIndexUpdate", o."lastDataChange"
         """
 
         try:
@@ -258,62 +672,20 @@ class DatabaseService:
                     logger.info(f"No chunks found for document {document_id}")
                     return []
 
+                # Every row belongs to the same document, so its metadata is
+                # built once and merged into each chunk's metadata
+                first_row = rows[0]
+                document_metadata = self._build_document_metadata(
+                    first_row["document_metadata"],
+                    first_row["document_title"],
+                    first_row,
+                )
+
                 results = []
                 for row in rows:
-                    # Parse chunk metadata
-                    chunk_metadata = row["chunk_metadata"]
-                    if isinstance(chunk_metadata, str):
-                        try:
-                            chunk_metadata = json.loads(chunk_metadata)
-                        except (json.JSONDecodeError, TypeError):
-                            chunk_metadata = {}
-                    elif chunk_metadata is None:
-                        chunk_metadata = {}
-
-                    # Parse document metadata
-                    document_metadata = row["document_metadata"]
-                    if isinstance(document_metadata, str):
-                        try:
-                            document_metadata = json.loads(document_metadata)
-                        except (json.JSONDecodeError, TypeError):
-                            document_metadata = {}
-                    elif document_metadata is None:
-                        document_metadata = {}
-
-                    # Prepare permission metadata
-                    permission_metadata = {
-                        "accessLevel": row["accessLevel"],
-                        "groupId": row["groupId"],
-                        "restrictedToUsers": row["restrictedToUsers"] or [],
-                    }
-
-                    # Combine all metadata
-                    combined_metadata = {
-                        **chunk_metadata,
-                        **document_metadata,
-                        "document_title": row["document_title"],
-                        **permission_metadata,
-                    }
-
-                    chunk_result = {
-                        "chunk_id": row["chunk_id"],
-                        "content": row["content"],
-                        "document_id": row["document_id"],
-                        "metadata": combined_metadata,
-                        "createdAt": row["createdAt"],
-                        "updatedAt": row["updatedAt"]
-                    }
-
-                    # Convert embedding vector from bytes to numpy array if present
-                    if row["vector"]:
-                        chunk_result["embedding"] = np.frombuffer(
-                            row["vector"], dtype=np.float32
-                        )
-                        chunk_result["embedding_id"] = row["embedding_id"]
-                    else:
-                        chunk_result["embedding"] = None
-                        chunk_result["embedding_id"] = None
-
+                    chunk_result = self._row_to_result(row, document_metadata)
+                    chunk_result["createdAt"] = row["createdAt"]
+                    chunk_result["updatedAt"] = row["updatedAt"]
                     results.append(chunk_result)
 
                 logger.info(f"Retrieved {len(results)} chunks for document {document_id}")
@@ -343,15 +715,8 @@ class DatabaseService:
                     logger.info(f"Document {document_id} not found or is deleted")
                     return None
 
-                # Parse metadata if it's a JSON string
-                metadata = row["metadata"]
-                if isinstance(metadata, str):
-                    try:
-                        metadata = json.loads(metadata)
-                    except (json.JSONDecodeError, TypeError):
-                        metadata = {}
-                elif metadata is None:
-                    metadata = {}
+                # jsonb arrives already decoded by the connection's codec
+                metadata = row["metadata"] or {}
 
                 document = {
                     "id": row["id"],
@@ -396,7 +761,7 @@ class DatabaseService:
                     document_metadata.get("accessLevel", "GROUP"),
                     document_metadata.get("groupId"),
                     document_metadata.get("restrictedToUsers", []),
-                    json.dumps(document_metadata),
+                    document_metadata,
                 )
                 logger.info(f"Saved document {document_id} to database")
                 return document_id
@@ -404,35 +769,81 @@ class DatabaseService:
             logger.error(f"Failed to save document: {e}")
             raise
 
+    @asynccontextmanager
+    async def bulk_session(self) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Acquire one connection and transaction for a series of writes, e.g.
+
+            async with database_service.bulk_session() as conn:
+                chunk_id = await database_service.save_chunk_conn(conn, ...)
+                await database_service.save_embedding_conn(conn, ..., chunk_id, ...)
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
     async def save_chunk(
         self, chunk_data: Dict[str, Any], document_id: str, organization_id: str
     ) -> str:
-        query = """
-            INSERT INTO "Chunk" (
-                id, "documentId", "organizationId", content, metadata, "isDeleted",
-                "createdAt", "updatedAt"
-            )
-            VALUES ($1, $2, $3, $4, $5, false, NOW(), NOW())
-            RETURNING id
-        """
+        chunk_ids = await self.save_chunks_bulk([chunk_data], document_id, organization_id)
+        return chunk_ids[0]
 
-        try:
-            import uuid
+    async def save_chunk_conn(
+        self,
+        conn: asyncpg.Connection,
+        chunk_data: Dict[str, Any],
+        document_id: str,
+        organization_id: str,
+    ) -> str:
+        chunk_ids = await self.save_chunks_bulk(
+            [chunk_data], document_id, organization_id, conn=conn
+        )
+        return chunk_ids[0]
 
-            chunk_id = str(uuid.uuid4())
+    async def save_chunks_bulk(
+        self,
+        chunks_data: List[Dict[str, Any]],
+        document_id: str,
+        organization_id: str,
+        conn: Optional[asyncpg.Connection] = None,
+        chunk_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Args:
+            chunks_data: Chunk dicts with "content" and optional "metadata"
+            document_id: Document the chunks belong to
+            organization_id: Organization the chunks belong to
+            conn: Connection from bulk_session; a pooled one is used if omitted
+            chunk_ids: Ids assigned by the caller; generated if omitted
 
-            async with self.pool.acquire() as conn:
-                await conn.execute(
-                    query,
+        Returns:
+            Chunk ids, in the same order as chunks_data
+        """
+        if not chunks_data:
+            return []
+
+        try:
+            if chunk_ids is None:
+                chunk_ids = [str(uuid.uuid4()) for _ in chunks_data]
+            now = datetime.utcnow()
+            records = [
+                (
                     chunk_id,
                     document_id,
                     organization_id,
                     chunk_data["content"],
-                    json.dumps(chunk_data.get("metadata", {})),
+                    chunk_data.get("metadata", {}),
+                    False,
+                    now,
+                    now,
                 )
-                return chunk_id
+                for chunk_id, chunk_data in zip(chunk_ids, chunks_data)
+            ]
+
+            await self._insert_records("Chunk", CHUNK_COLUMNS, records, conn)
+            return chunk_ids
         except Exception as e:
-            logger.error(f"Failed to save chunk: {e}")
+            logger.error(f"Failed to save chunks: {e}")
             raise
 
     async def save_embedding(
@@ -443,77 +854,154 @@ class DatabaseService:
         organization_id: str,
         model_name: str = "default",
     ) -> str:
-        query = """
-            INSERT INTO "Embedding" (
-                id, "chunkId", "documentId", "organizationId", vector, "isDeleted",
-                "createdAt", "updatedAt"
-            )
-            VALUES ($1, $2, $3, $4, $5, false, NOW(), NOW())
-            RETURNING id
+        embedding_ids = await self.save_embeddings_bulk(
+            [embedding_vector], [chunk_id], document_id, organization_id, model_name
+        )
+        return embedding_ids[0]
+
+    async def save_embedding_conn(
+        self,
+        conn: asyncpg.Connection,
+        embedding_vector: np.ndarray,
+        chunk_id: str,
+        document_id: str,
+        organization_id: str,
+        model_name: str = "default",
+    ) -> str:
+        embedding_ids = await self.save_embeddings_bulk(
+            [embedding_vector], [chunk_id], document_id, organization_id, model_name,
+            conn=conn,
+        )
+        return embedding_ids[0]
+
+    async def save_embeddings_bulk(
+        self,
+        embedding_vectors: Union[List[np.ndarray], np.ndarray],
+        chunk_ids: List[str],
+        document_id: str,
+        organization_id: str,
+        model_name: str = "default",
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> List[str]:
         """
+        Args:
+            embedding_vectors: One vector per chunk, or an (N, D) matrix with
+                one row per chunk
+            chunk_ids: Ids of the chunks the vectors were generated for
+            document_id: Document the chunks belong to
+            organization_id: Organization the chunks belong to
+            conn: Connection from bulk_session; a pooled one is used if omitted
 
-        try:
-            import uuid
+        Returns:
+            Generated embedding ids, in the same order as embedding_vectors
+        """
+        if len(embedding_vectors) == 0:
+            return []
 
-            embedding_id = str(uuid.uuid4())
+        try:
+            embedding_ids = [str(uuid.uuid4()) for _ in embedding_vectors]
+            now = datetime.utcnow()
 
-            # Convert numpy array to bytes
-            vector_bytes = embedding_vector.astype(np.float32).tobytes()
+            # int8 with a per-vector scale unless quantization is disabled
+            vectors_bytes = encode_vectors(embedding_vectors, self.quantize_embeddings)
 
-            async with self.pool.acquire() as conn:
-                await conn.execute(
-                    query,
+            records = [
+                (
                     embedding_id,
                     chunk_id,
                     document_id,
                     organization_id,
                     vector_bytes,
+                    False,
+                    now,
+                    now,
+                )
+                for embedding_id, chunk_id, vector_bytes in zip(
+                    embedding_ids, chunk_ids, vectors_bytes
                 )
-                return embedding_id
+            ]
+
+            await self._insert_records("Embedding", EMBEDDING_COLUMNS, records, conn)
+            return embedding_ids
         except Exception as e:
-            logger.error(f"Failed to save embedding: {e}")
+            logger.error(f"Failed to save embeddings: {e}")
             raise
 
-    async def mark_chunks_deleted(self, organization_id: str, chunk_ids: List[str]):
-        query = """
-            UPDATE "Chunk"
-            SET "isDeleted" = true, "updatedAt" = NOW()
-            WHERE id = ANY($1) AND "organizationId" = $2
-        """
-
+    async def _insert_records(
+        self,
+        table: str,
+        columns: List[str],
+        records: List[Tuple],
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> None:
+        if conn is None:
+            async with self.bulk_session() as session_conn:
+                await self._insert_records(table, columns, records, session_conn)
+            return
+
+        # COPY has a fixed setup cost, so small batches go through executemany
+        if len(records) >= COPY_THRESHOLD:
+            await conn.copy_records_to_table(table, records=records, columns=columns)
+        else:
+            await conn.executemany(INSERT_QUERIES[table], records)
+
+    async def mark_chunks_deleted(
+        self,
+        organization_id: str,
+        chunk_ids: List[str],
+        conn: Optional[asyncpg.Connection] = None,
+    ):
         try:
-            async with self.pool.acquire() as conn:
-                result = await conn.execute(query, chunk_ids, organization_id)
-                # Extract number of affected rows from result
-                affected_rows = int(result.split()[-1]) if result else 0
-                logger.info(
-                    f"Marked {affected_rows} chunks as deleted for organization {organization_id}"
-                )
+            affected_rows = await self._mark_deleted(
+                MARK_CHUNKS_DELETED_QUERY, organization_id, chunk_ids, conn
+            )
+            logger.info(
+                f"Marked {affected_rows} chunks as deleted for organization {organization_id}"
+            )
         except Exception as e:
             logger.error(f"Failed to mark chunks as deleted: {e}")
             raise
 
     async def mark_embeddings_deleted(
-        self, organization_id: str, embedding_ids: List[str]
+        self,
+        organization_id: str,
+        embedding_ids: List[str],
+        conn: Optional[asyncpg.Connection] = None,
     ):
-        query = """
-            UPDATE "Embedding"
-            SET "isDeleted" = true, "updatedAt" = NOW()
-            WHERE id = ANY($1) AND "organizationId" = $2
-        """
-
         try:
-            async with self.pool.acquire() as conn:
-                result = await conn.execute(query, embedding_ids, organization_id)
-                # Extract number of affected rows from result
-                affected_rows = int(result.split()[-1]) if result else 0
-                logger.info(
-                    f"Marked {affected_rows} embeddings as deleted for organization {organization_id}"
-                )
+            affected_rows = await self._mark_deleted(
+                MARK_EMBEDDINGS_DELETED_QUERY, organization_id, embedding_ids, conn
+            )
+            logger.info(
+                f"Marked {affected_rows} embeddings as deleted for organization {organization_id}"
+            )
         except Exception as e:
             logger.error(f"Failed to mark embeddings as deleted: {e}")
             raise
 
+    async def _mark_deleted(
+        self,
+        query: str,
+        organization_id: str,
+        ids: List[str],
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> int:
+        if conn is None:
+            async with self.pool.acquire() as pooled_conn:
+                return await self._mark_deleted(query, organization_id, ids, pooled_conn)
+
+        # Bounded batches keep each UPDATE's array parameter and lock footprint
+        # small; the shared query text is planned once per connection by
+        # asyncpg's statement cache
+        affected_rows = 0
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            result = await conn.execute(
+                query, ids[start:start + DELETE_BATCH_SIZE], organization_id
+            )
+            # Extract number of affected rows from result
+            affected_rows += int(result.split()[-1]) if result else 0
+        return affected_rows
+
     async def log_access_denial(
         self,
         organization_id: str,
@@ -527,47 +1015,108 @@ class DatabaseService:
         similarity_score: Optional[float] = None,
         metadata: Optional[Dict[str, Any]] = None
     ):
-        if not self.pool:
-            await self.connect()
-
-        query = """
-            INSERT INTO "AccessDenialLog" (
-                "organizationId",
-                "userId",
-                "searchQuery",
-                "chunkId",
-                "documentId",
-                "groupId",
-                "accessLevel",
-                "denialReason",
-                "similarity",
-                "metadata",
-                "timestamp"
-            )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, NOW())
+        self.queue_access_denial(
+            organization_id,
+            user_id,
+            search_query,
+            chunk_id,
+            document_id,
+            group_id,
+            access_level,
+            denial_reason,
+            similarity_score,
+            metadata,
+        )
+
+    def queue_access_denial(
+        self,
+        organization_id: str,
+        user_id: str,
+        search_query: str,
+        chunk_id: str,
+        document_id: str,
+        group_id: Optional[str],
+        access_level: str,
+        denial_reason: str,
+        similarity_score: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
         """
-
+        Queue an access denial for logging. Rows are written in batches by a
+        background task, so searches never wait on the INSERT. Must be called
+        from the event loop thread.
+        """
+        if self._denial_queue is None:
+            self._denial_queue = asyncio.Queue()
+        if self._denial_task is None or self._denial_task.done():
+            self._denial_task = asyncio.create_task(self._drain_access_denials())
+
+        self._denial_queue.put_nowait((
+            str(uuid.uuid4()),
+            organization_id,
+            user_id,
+            search_query,
+            chunk_id,
+            document_id,
+            group_id,
+            access_level,
+            denial_reason,
+            similarity_score,
+            metadata or None,
+            datetime.utcnow(),
+        ))
+
+    def _take_access_denials(self, limit: int) -> List[Tuple]:
+        records = []
+        while len(records) < limit and not self._denial_queue.empty():
+            records.append(self._denial_queue.get_nowait())
+        return records
+
+    async def _write_access_denials(self, records: List[Tuple]) -> None:
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute(
-                    query,
-                    organization_id,
-                    user_id,
-                    search_query,
-                    chunk_id,
-                    document_id,
-                    group_id,
-                    access_level,
-                    denial_reason,
-                    similarity_score,
-                    json.dumps(metadata) if metadata else None
-                )
-                logger.debug(
-                    f"Logged access denial for user {user_id} to chunk {chunk_id} "
-                    f"(reason: {denial_reason})"
-                )
+            if not self.pool:
+                await self.connect()
+            await self._insert_records("AccessDenialLog", ACCESS_DENIAL_COLUMNS, records)
+            logger.debug(f"Logged {len(records)} access denials")
         except Exception as e:
-            logger.error(f"Failed to log access denial: {e}")
+            logger.error(f"Failed to log {len(records)} access denials: {e}")
+
+    async def _drain_access_denials(self) -> None:
+        while True:
+            # Block until there is work, then let a batch accumulate
+            first = await self._denial_queue.get()
+            try:
+                await asyncio.sleep(DENIAL_FLUSH_INTERVAL)
+            except asyncio.CancelledError:
+                # Leave the row for flush_access_denials
+                self._denial_queue.put_nowait(first)
+                raise
+            records = [first] + self._take_access_denials(DENIAL_BATCH_SIZE - 1)
+            # Shielded so a shutdown does not abort a batch halfway through
+            self._denial_write = asyncio.ensure_future(self._write_access_denials(records))
+            await asyncio.shield(self._denial_write)
+
+    async def flush_access_denials(self) -> None:
+        """
+        Stop the background writer and write every queued access denial.
+        """
+        if self._denial_task is not None:
+            self._denial_task.cancel()
+            try:
+                await self._denial_task
+            except asyncio.CancelledError:
+                pass
+            self._denial_task = None
+        if self._denial_write is not None:
+            await self._denial_write
+            self._denial_write = None
+
+        if self._denial_queue is None:
+            return
+        while not self._denial_queue.empty():
+            await self._write_access_denials(
+                self._take_access_denials(DENIAL_BATCH_SIZE)
+            )
 
     async def cleanup(self) -> None:
         """
@@ -575,6 +1124,7 @@ class DatabaseService:
         """
         logger.info("Cleaning up DatabaseService")
         try:
+            await self.flush_access_denials()
             if self.pool:
                 await self.pool.close()
                 self.pool = None
@@ -1,31 +1,111 @@
+import asyncio
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Union
 
-from docling.datamodel.base_models import InputFormat
+from docling.datamodel.base_models import DocumentStream, InputFormat
 from docling.datamodel.pipeline_options import (
+    AcceleratorOptions,
     PdfPipelineOptions,
     RapidOcrOptions,
     smolvlm_picture_description,
 )
 from docling.document_converter import DocumentConverter, PdfFormatOption
 
+from app.config import get_settings
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 IMAGE_PLACEHOLDER = "<!-- image_placeholder -->"
 PAGE_BREAK_PLACEHOLDER = "<!-- page_break -->"
 
+_conversion_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_conversion_worker() -> None:
+    # Load the OCR and picture description models once per worker process
+    # instead of on the first document each worker converts
+    document_conversion_service.converter.initialize_pipeline(InputFormat.PDF)
+
+
+def _convert_in_worker(document_path: Union[Path, DocumentStream], n_pages: int) -> str:
+    return document_conversion_service.process_document(document_path, n_pages)
+
+
+def _conversion_workers() -> int:
+    return getattr(settings, 'DOCUMENT_CONVERSION_WORKERS', None) or max(
+        1, (os.cpu_count() or 2) // 2
+    )
+
+
+def get_conversion_pool() -> ProcessPoolExecutor:
+    global _conversion_pool
+    if _conversion_pool is None:
+        max_workers = _conversion_workers()
+        _conversion_pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            # Forking the running server would copy its event loop and threads
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_conversion_worker,
+        )
+        logger.info(f"Started document conversion pool with {max_workers} workers")
+    return _conversion_pool
+
+
+def shutdown_conversion_pool() -> None:
+    """Stop the conversion pool; called once by the app lifespan on shutdown"""
+    global _conversion_pool
+    if _conversion_pool is not None:
+        _conversion_pool.shutdown(wait=True)
+        _conversion_pool = None
+
+
+async def aconvert_document(
+    document_path: Union[Path, DocumentStream],
+    n_pages: int = -1
+) -> str:
+    """
+    Run document_conversion_service.process_document in the conversion
+    process pool so OCR and picture description neither block the event
+    loop nor share one core. Each worker converts with its own copy of the
+    module-level service, so every caller shares its pipeline options
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_conversion_pool(), _convert_in_worker, document_path, n_pages
+    )
+
 
 class DocumentConversionService:
 
     def __init__(self):
+        # Quantized ONNX models can be swapped in through the model paths;
+        # unset paths keep RapidOCR's bundled models
+        ocr_options = RapidOcrOptions(
+            det_model_path=getattr(settings, 'OCR_DET_MODEL_PATH', None),
+            rec_model_path=getattr(settings, 'OCR_REC_MODEL_PATH', None),
+        )
+        picture_description_options = smolvlm_picture_description.model_copy(
+            update={"batch_size": getattr(settings, 'PICTURE_DESCRIPTION_BATCH_SIZE', 8)}
+        )
+
         self.pipeline_options = PdfPipelineOptions(
             generate_page_images=True,
             images_scale=1.00,
             do_ocr=True,
             do_picture_description=True,
-            ocr_options=RapidOcrOptions(),
-            picture_description_options=smolvlm_picture_description,
+            ocr_options=ocr_options,
+            picture_description_options=picture_description_options,
+            # Split the cores between the conversion workers instead of every
+            # worker starting one inference thread per core
+            accelerator_options=AcceleratorOptions(
+                num_threads=max(1, (os.cpu_count() or 2) // _conversion_workers())
+            ),
         )
 
         self.converter = DocumentConverter(
@@ -46,33 +126,43 @@ class DocumentConversionService:
         Returns:
             Text with replacements made
         """
-        for replacement in replacements:
-            if target in text:
-                text = text.replace(target, replacement, 1)
-            else:
-                logger.warning(
-                    f"No more occurrences of '{target}' found in the text for replacement ({replacement}). "
-                    f"Skipping this replacement."
-                )
-        return text
+        # One split and join instead of rescanning the text for every replacement
+        parts = text.split(target)
+        occurrences = len(parts) - 1
+
+        for replacement in replacements[occurrences:]:
+            logger.warning(
+                f"No more occurrences of '{target}' found in the text for replacement ({replacement}). "
+                f"Skipping this replacement."
+            )
+
+        pieces = [parts[0]]
+        for i, part in enumerate(parts[1:]):
+            # Occurrences without a replacement are left as they were
+            pieces.append(replacements[i] if i < len(replacements) else target)
+            pieces.append(part)
+        return "".join(pieces)
 
     def process_document(
         self,
-        document_path: Path,
+        document_path: Union[Path, DocumentStream],
         n_pages: int = -1
     ) -> str:
         """
         Process a document and convert it to markdown with image descriptions
 
         Args:
-            document_path: Path to the document file
+            document_path: Path to the document file, or an in-memory stream
             n_pages: Number of pages to process (-1 for all pages)
 
         Returns:
             Processed document text in markdown format
         """
+        document_name = (
+            document_path.name if isinstance(document_path, DocumentStream) else document_path
+        )
         try:
-            logger.info(f"Processing document: {document_path}")
+            logger.info(f"Processing document: {document_name}")
 
             # Convert document
             result = self.converter.convert(document_path)
@@ -80,10 +170,10 @@ class DocumentConversionService:
 
             # Extract image annotations
             annotations = []
+            extend_annotations = annotations.extend
             for picture in document.pictures:
-                logger.debug(f"Processing picture: {picture}")
-                for annotation in picture.annotations:
-                    annotations.append(annotation.text)
+                extend_annotations(annotation.text for annotation in picture.annotations)
+            logger.debug(f"Collected {len(annotations)} annotations from {len(document.pictures)} pictures")
 
             # Check for mismatch
             if len(annotations) != len(document.pictures):
@@ -101,14 +191,15 @@ class DocumentConversionService:
 
             # Limit pages if specified
             if n_pages != -1:
-                pages = text.split(PAGE_BREAK_PLACEHOLDER)
+                # Stop splitting once the requested pages are found
+                pages = text.split(PAGE_BREAK_PLACEHOLDER, n_pages)
                 text = PAGE_BREAK_PLACEHOLDER.join(pages[:n_pages])
 
             logger.info(f"Successfully processed document with {len(text)} characters")
             return text
 
         except Exception as e:
-            logger.error(f"Error processing document {document_path}: {e}")
+            logger.error(f"Error processing document {document_name}: {e}")
             raise
 
     def process_document_from_bytes(
@@ -129,18 +220,9 @@ class DocumentConversionService:
             Processed document text in markdown format
         """
         try:
-            # Save bytes to temporary file for processing
-            import tempfile
-
-            with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix, delete=False) as tmp_file:
-                tmp_file.write(document_bytes)
-                tmp_path = Path(tmp_file.name)
-
-            try:
-                return self.process_document(tmp_path, n_pages)
-            finally:
-                # Clean up temporary file
-                tmp_path.unlink(missing_ok=True)
+            # Docling reads the stream directly, so nothing touches the disk
+            source = DocumentStream(name=filename, stream=BytesIO(document_bytes))
+            return self.process_document(source, n_pages)
 
         except Exception as e:
             logger.error(f"Error processing document from bytes: {e}")
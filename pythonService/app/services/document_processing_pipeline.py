@@ -1,27 +1,34 @@
 import logging
 import os
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 import asyncio
 
-from app.services.document_conversion_service import DocumentConversionService
+import numpy as np
+
+from app.config import get_settings
+from app.services.document_conversion_service import aconvert_document
 from app.services.text_cleaning_service import get_text_cleaning_service
 from app.services.chunking_service import chunking_service
 from app.services.metadata_extraction_service import metadata_extraction_service
-from app.services.context_generation_service import context_generation_service
+from app.services.context_generation_service import get_context_generation_service
 from app.services.embedding_service import embedding_service
 from app.services.database_service import database_service
 from app.services.search_index_builder_service import search_index_builder
 from app.utils.token_utils import token_utils
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class DocumentProcessingPipelineService:
 
     def __init__(self):
-        self.document_converter = DocumentConversionService()
         self.text_cleaner = None
+        self.persist_semaphore = asyncio.BoundedSemaphore(
+            getattr(settings, 'PIPELINE_MAX_CONCURRENT_WRITES', 4)
+        )
 
     async def process_document(
         self,
@@ -42,7 +49,7 @@ class DocumentProcessingPipelineService:
         Returns:
             Processing results including status and statistics
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter()
         stats = {
             "chunks_created": 0,
             "embeddings_created": 0,
@@ -65,21 +72,40 @@ class DocumentProcessingPipelineService:
             logger.info(f"Created {len(chunks)} chunks")
 
             logger.info("Step 4: Processing chunks with batch operations")
-            processed_chunks = await self._process_chunks_batch(
+            processed_chunks, persist_task = await self._process_chunks_batch(
                 chunks, document_metadata, document_id, organization_id
             )
 
+            try:
+                if processed_chunks and search_index_builder.has_indexes(organization_id):
+                    # The chunks are added to the existing in-memory index
+                    # while they are still being written to the database
+                    logger.info("Step 5: Updating search indexes")
+                    await search_index_builder.add_chunks(organization_id, processed_chunks)
+                    logger.info(f"Added {len(processed_chunks)} chunks to search index")
+                elif processed_chunks:
+                    # A new index is built from the database, so it can only
+                    # start once the chunks are committed; it includes them
+                    await persist_task
+                    logger.info("Step 5: Building search indexes")
+                    await search_index_builder.build_or_update_index(organization_id)
+                    logger.info(f"Built search index including {len(processed_chunks)} new chunks")
+            finally:
+                try:
+                    await persist_task
+                except Exception:
+                    if processed_chunks and search_index_builder.has_indexes(organization_id):
+                        await search_index_builder.remove_chunks(
+                            organization_id, [chunk["chunk_id"] for chunk in processed_chunks]
+                        )
+                    raise
+
             stats["chunks_created"] = len(processed_chunks)
             stats["embeddings_created"] = len(processed_chunks)
 
             logger.info(f"Successfully processed {len(processed_chunks)} chunks using batch operations")
 
-            if processed_chunks:
-                logger.info("Step 5: Updating search indexes")
-                await search_index_builder.add_chunks(organization_id, processed_chunks)
-                logger.info(f"Added {len(processed_chunks)} chunks to search index")
-
-            processing_time = (datetime.utcnow() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
 
             return {
                 "status": "completed" if not stats["errors"] else "completed_with_errors",
@@ -97,16 +123,17 @@ class DocumentProcessingPipelineService:
                 "stats": stats
             }
         finally:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Cleaned up temporary file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to clean up file {file_path}: {e}")
+            try:
+                await asyncio.to_thread(os.remove, file_path)
+                logger.info(f"Cleaned up temporary file: {file_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Failed to clean up file {file_path}: {e}")
 
     async def _convert_document(self, file_path: str) -> str:
         from pathlib import Path
-        return self.document_converter.process_document(Path(file_path))
+        return await aconvert_document(Path(file_path))
 
 
     async def _clean_text(self, text: str) -> str:
@@ -119,11 +146,11 @@ class DocumentProcessingPipelineService:
         chunks_text = await chunking_service.chunk_document(text)
         return [{"content": chunk} for chunk in chunks_text]
 
-    async def _generate_context(
-        self, chunk_content: str, all_chunks: List[Dict[str, Any]], chunk_index: int
-    ) -> str:
-        full_document = "\n\n".join([chunk["content"] for chunk in all_chunks])
-        return await context_generation_service.generate_context_for_chunk(
+    def _join_chunks(self, chunks: List[Dict[str, Any]]) -> str:
+        return "\n\n".join(chunk["content"] for chunk in chunks)
+
+    async def _generate_context(self, chunk_content: str, full_document: str) -> str:
+        return await get_context_generation_service().generate_context_for_chunk(
             chunk_content, full_document
         )
 
@@ -143,52 +170,51 @@ class DocumentProcessingPipelineService:
         document_metadata: Dict[str, Any],
         document_id: str,
         organization_id: str
-    ) -> List[Dict[str, Any]]:
+    ) -> Tuple[List[Dict[str, Any]], "asyncio.Task[None]"]:
+        """
+        Returns:
+            The processed chunks, and the task writing them to the database;
+            the caller must await it
+        """
         try:
-            logger.info("Generating contexts for all chunks...")
-            contexts = []
-            for i, chunk in enumerate(chunks):
-                context = await self._generate_context(chunk["content"], chunks, i)
-                contexts.append(context)
-
-            logger.info("Extracting metadata for all chunks...")
-            metadatas = []
-            for chunk in chunks:
-                metadata = await self._extract_metadata(chunk["content"], document_metadata)
-                metadatas.append(metadata)
+            # Every call is an independent LLM request, so both stages run
+            # concurrently; llm_service caps the requests in flight
+            logger.info("Generating contexts and extracting metadata for all chunks...")
+            # The document every context is generated against is built once
+            full_document = self._join_chunks(chunks)
+            contexts, metadatas = await asyncio.gather(
+                get_context_generation_service().generate_contexts_for_chunks(
+                    [chunk["content"] for chunk in chunks], full_document
+                ),
+                metadata_extraction_service.extract_metadata_batch(
+                    [chunk["content"] for chunk in chunks]
+                ),
+            )
 
             logger.info("Generating embeddings in batch...")
-            embedding_texts = []
-            for i, (chunk, context) in enumerate(zip(chunks, contexts)):
-                embedding_text = f"{chunk['content']}\n\nContext: {context}"
+            embedding_texts = [
+                f"{chunk['content']}\n\nContext: {context}"
+                for chunk, context in zip(chunks, contexts)
+            ]
+            # One batched tokenizer call, off the event loop
+            token_counts = await asyncio.to_thread(
+                token_utils.count_tokens_batch, embedding_texts
+            )
+            max_embedding_tokens = 8000
 
-                is_valid, token_count = token_utils.validate_embedding_text_length(embedding_text)
-                if not is_valid:
+            for i, (chunk, context, token_count) in enumerate(zip(chunks, contexts, token_counts)):
+                if token_count > max_embedding_tokens:
                     logger.warning(f"Chunk {i} embedding text has {token_count} tokens, truncating context")
-                    max_context_tokens = 200  # limit for context
-                    truncated_context = token_utils.truncate_to_token_limit(context, max_context_tokens)
-                    embedding_text = f"{chunk['content']}\n\nContext: {truncated_context}"
-
-                    is_valid_final, final_token_count = token_utils.validate_embedding_text_length(embedding_text)
-                    if not is_valid_final:
-                        logger.error(f"Chunk {i} still exceeds token limit after truncation ({final_token_count} tokens), using chunk only")
-                        embedding_text = chunk['content']
+                    embedding_texts[i] = token_utils.build_embedding_text(
+                        chunk['content'], context, max_embedding_tokens, max_context_tokens=200
+                    )
 
-                embedding_texts.append(embedding_text)
+            embedding_matrix = await embedding_service.generate_embeddings_matrix(embedding_texts)
 
-            embedding_vectors = await embedding_service.generate_embeddings_batch(embedding_texts)
-
-            logger.info("Saving chunks and embeddings to database...")
-            processed_chunks = []
+            chunks_data = []
 
-            for i, (chunk, context, metadata, embedding_vector) in enumerate(
-                zip(chunks, contexts, metadatas, embedding_vectors)
-            ):
-                if embedding_vector is None:
-                    logger.error(f"Failed to generate embedding for chunk {i}")
-                    continue
-
-                chunk_data = {
+            for i, (chunk, context, metadata) in enumerate(zip(chunks, contexts, metadatas)):
+                chunks_data.append({
                     "content": chunk["content"],
                     "metadata": {
                         **metadata,  # extracted metadata from LLM
@@ -198,29 +224,51 @@ class DocumentProcessingPipelineService:
                         "groupId": document_metadata.get("groupId"),
                         "restrictedToUsers": document_metadata.get("restrictedToUsers", [])
                     }
-                }
-
-                chunk_id = await database_service.save_chunk(
-                    chunk_data, document_id, organization_id
-                )
+                })
 
-                embedding_id = await database_service.save_embedding(
-                    embedding_vector, chunk_id, document_id, organization_id
-                )
+            chunk_ids = [str(uuid.uuid4()) for _ in chunks_data]
+            persist_task = asyncio.create_task(
+                self._persist_chunks(chunks_data, chunk_ids, embedding_matrix, document_id, organization_id)
+            )
 
-                processed_chunks.append({
+            processed_chunks = [
+                {
                     "chunk_id": chunk_id,
                     "document_id": document_id,
                     "embedding": embedding_vector,
                     "metadata": chunk_data["metadata"]
-                })
-
-            return processed_chunks
+                }
+                for chunk_id, chunk_data, embedding_vector in zip(
+                    chunk_ids, chunks_data, embedding_matrix
+                )
+            ]
+            return processed_chunks, persist_task
 
         except Exception as e:
             logger.error(f"Error in batch chunk processing: {e}")
             raise e
 
+    async def _persist_chunks(
+        self,
+        chunks_data: List[Dict[str, Any]],
+        chunk_ids: List[str],
+        embedding_matrix: np.ndarray,
+        document_id: str,
+        organization_id: str
+    ) -> None:
+        # Each write holds a pooled connection for the whole bulk insert; cap
+        # how many concurrent documents do so, leaving connections for search
+        async with self.persist_semaphore:
+            logger.info("Saving chunks and embeddings to database...")
+            async with database_service.bulk_session() as conn:
+                await database_service.save_chunks_bulk(
+                    chunks_data, document_id, organization_id, conn=conn, chunk_ids=chunk_ids
+                )
+
+                await database_service.save_embeddings_bulk(
+                    embedding_matrix, chunk_ids, document_id, organization_id, conn=conn
+                )
+
     async def _process_single_chunk(
         self,
         chunk: Dict[str, Any],
@@ -232,7 +280,7 @@ class DocumentProcessingPipelineService:
     ) -> Optional[Dict[str, Any]]:
         try:
             context_task = asyncio.create_task(
-                self._generate_context(chunk["content"], all_chunks, chunk_index)
+                self._generate_context(chunk["content"], self._join_chunks(all_chunks))
             )
             metadata_task = asyncio.create_task(
                 self._extract_metadata(chunk["content"], document_metadata)
@@ -259,13 +307,14 @@ class DocumentProcessingPipelineService:
                 }
             }
 
-            chunk_id = await database_service.save_chunk(
-                chunk_data, document_id, organization_id
-            )
+            async with database_service.bulk_session() as conn:
+                chunk_id = await database_service.save_chunk_conn(
+                    conn, chunk_data, document_id, organization_id
+                )
 
-            embedding_id = await database_service.save_embedding(
-                embedding_vector, chunk_id, document_id, organization_id
-            )
+                await database_service.save_embedding_conn(
+                    conn, embedding_vector, chunk_id, document_id, organization_id
+                )
 
             return {
                 "chunk_id": chunk_id,
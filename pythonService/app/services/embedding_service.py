@@ -1,5 +1,7 @@
+import hashlib
 import logging
-from typing import List, Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 import numpy as np
 import asyncio
 from openai import AsyncOpenAI
@@ -10,13 +12,29 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+FALLBACK_LOCAL_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row of a float32 matrix in place. einsum sums the
+    squares without materializing a squared copy, and the reciprocal is
+    applied with one in-place multiply. Zero rows are left as they are.
+    """
+    norms = np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings))
+    np.divide(1.0, norms, out=norms, where=norms > 0)
+    embeddings *= norms[:, None].astype(embeddings.dtype, copy=False)
+    return embeddings
+
 
 class EmbeddingService:
 
     def __init__(self):
-        self.local_model_name = getattr(settings, 'EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+        self.local_model_name = getattr(settings, 'EMBEDDING_MODEL', FALLBACK_LOCAL_MODEL)
         self._local_model = None
         self.local_embedding_dim = None
+        self._local_encode_lock = asyncio.Lock()
+        self.half_precision = getattr(settings, 'EMBEDDING_HALF_PRECISION', True)
 
         self.openai_client = None
         if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
@@ -26,6 +44,12 @@ class EmbeddingService:
         self.openai_model = getattr(settings, 'OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
         self.batch_size = getattr(settings, 'EMBEDDING_BATCH_SIZE', 100)
         self.max_retries = getattr(settings, 'EMBEDDING_MAX_RETRIES', 3)
+        self.max_concurrency = getattr(settings, 'EMBEDDING_MAX_CONCURRENCY', 4)
+
+        # LRU of embeddings by (model, normalize, text digest), so unchanged
+        # chunks of a re-processed document are not embedded again
+        self.cache_size = getattr(settings, 'EMBEDDING_CACHE_SIZE', 10000)
+        self._embedding_cache: "OrderedDict[Tuple[str, bool, bytes], np.ndarray]" = OrderedDict()
 
         if self.provider == 'openai':
             self.embedding_dim = 1536 if 'small' in self.openai_model else 3072
@@ -37,18 +61,30 @@ class EmbeddingService:
         if self._local_model is None and self.provider == 'local':
             logger.info(f"Loading local embedding model: {self.local_model_name}")
             try:
-                self._local_model = SentenceTransformer(self.local_model_name)
+                self._local_model = self._load_local_model(self.local_model_name)
                 self.local_embedding_dim = self._local_model.get_sentence_embedding_dimension()
                 self.embedding_dim = self.local_embedding_dim
                 logger.info(f"Local embedding model loaded successfully. Dimension: {self.embedding_dim}")
             except Exception as e:
                 logger.error(f"Failed to load local embedding model: {e}")
-                logger.info("Falling back to all-MiniLM-L6-v2")
-                self._local_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+                # Retrying the same model would fail the same way
+                if self.local_model_name == FALLBACK_LOCAL_MODEL:
+                    raise
+                logger.info(f"Falling back to {FALLBACK_LOCAL_MODEL}")
+                self._local_model = self._load_local_model(FALLBACK_LOCAL_MODEL)
                 self.local_embedding_dim = self._local_model.get_sentence_embedding_dimension()
                 self.embedding_dim = self.local_embedding_dim
         return self._local_model
 
+    def _load_local_model(self, model_name: str) -> SentenceTransformer:
+        model = SentenceTransformer(model_name)
+        # Half precision roughly doubles GPU throughput and halves its memory;
+        # CPU inference stays float32, where fp16 kernels are slower
+        if self.half_precision and model.device.type == 'cuda':
+            model.half()
+            logger.info(f"Running {model_name} in float16 on {model.device}")
+        return model
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -79,7 +115,7 @@ class EmbeddingService:
         wait=wait_exponential(multiplier=1, min=4, max=10),
         retry=retry_if_exception_type((Exception,))
     )
-    async def _generate_embeddings_batch_openai(self, texts: List[str]) -> List[np.ndarray]:
+    async def _generate_embeddings_batch_openai(self, texts: List[str]) -> np.ndarray:
         try:
             valid_indices = []
             valid_texts = []
@@ -90,7 +126,7 @@ class EmbeddingService:
 
             if not valid_texts:
                 logger.warning("No valid texts provided for batch embedding")
-                return [np.zeros(self.embedding_dim, dtype=np.float32) for _ in texts]
+                return np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
 
             response = await self.openai_client.embeddings.create(
                 model=self.openai_model,
@@ -98,27 +134,15 @@ class EmbeddingService:
                 encoding_format="float"
             )
 
-            embeddings = []
-            for embedding_data in response.data:
-                embedding = np.array(embedding_data.embedding, dtype=np.float32)
-
-                # Normalize for cosine similarity
-                norm = np.linalg.norm(embedding)
-                if norm > 0:
-                    embedding = embedding / norm
-
-                embeddings.append(embedding)
+            embeddings = np.asarray(
+                [embedding_data.embedding for embedding_data in response.data],
+                dtype=np.float32,
+            )
 
-            result = []
-            valid_idx = 0
-            for i in range(len(texts)):
-                if i in valid_indices:
-                    result.append(embeddings[valid_idx])
-                    valid_idx += 1
-                else:
-                    result.append(np.zeros(self.embedding_dim, dtype=np.float32))
+            # Normalize every row for cosine similarity in place
+            _normalize_rows(embeddings)
 
-            return result
+            return self._scatter_rows(embeddings, valid_indices, len(texts))
 
         except Exception as e:
             logger.error(f"OpenAI batch embedding generation failed: {e}")
@@ -132,7 +156,7 @@ class EmbeddingService:
             return np.zeros(self.embedding_dim, dtype=np.float32)
 
         try:
-            embedding = self.local_model.encode(text, convert_to_numpy=True)
+            embedding = self.local_model.encode(text, convert_to_numpy=True).astype(np.float32, copy=False)
 
             if normalize:
                 # Normalize for cosine similarity optimization
@@ -142,7 +166,7 @@ class EmbeddingService:
                 else:
                     logger.warning("Zero norm embedding generated")
 
-            return embedding.astype(np.float32)
+            return embedding.astype(np.float32, copy=False)
 
         except Exception as e:
             logger.error(f"Error generating local embedding: {e}")
@@ -157,10 +181,7 @@ class EmbeddingService:
         normalize: bool = True,
         batch_size: int = 32,
         show_progress: bool = True
-    ) -> List[np.ndarray]:
-        if not texts:
-            return []
-
+    ) -> np.ndarray:
         # Filter out empty texts but keep track of indices
         valid_indices = []
         valid_texts = []
@@ -174,7 +195,7 @@ class EmbeddingService:
             # Return zero vectors for all inputs
             if self.embedding_dim is None:
                 _ = self.local_model  # Force model loading to get dimension
-            return [np.zeros(self.embedding_dim, dtype=np.float32) for _ in texts]
+            return np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
 
         try:
             # Generate embeddings
@@ -185,70 +206,158 @@ class EmbeddingService:
                 show_progress_bar=show_progress
             )
 
+            # A half-precision model returns float16 rows
+            embeddings = embeddings.astype(np.float32, copy=False)
+
             if normalize:
-                # Normalize each embedding
-                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-                # Avoid division by zero
-                norms = np.where(norms > 0, norms, 1)
-                embeddings = embeddings / norms
+                # Normalize each embedding in place
+                _normalize_rows(embeddings)
 
-            # Create result list with zero vectors for empty texts
             if self.embedding_dim is None:
                 self.embedding_dim = embeddings.shape[1]
 
-            result = []
-            valid_idx = 0
-            for i in range(len(texts)):
-                if i in valid_indices:
-                    result.append(embeddings[valid_idx].astype(np.float32))
-                    valid_idx += 1
-                else:
-                    result.append(np.zeros(self.embedding_dim, dtype=np.float32))
-
-            return result
+            return self._scatter_rows(embeddings, valid_indices, len(texts))
 
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {e}")
             # Return zero vectors on error
             if self.embedding_dim is None:
                 _ = self.local_model
-            return [np.zeros(self.embedding_dim, dtype=np.float32) for _ in texts]
+            return np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+
+    def _scatter_rows(
+        self, embeddings: np.ndarray, valid_indices: List[int], total: int
+    ) -> np.ndarray:
+        # Place each embedding at its text's row; empty texts keep a zero vector
+        if len(valid_indices) == total:
+            return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        result = np.zeros((total, embeddings.shape[1]), dtype=np.float32)
+        result[valid_indices] = embeddings
+        return result
 
     async def generate_embedding(self, text: str, normalize: bool = True) -> np.ndarray:
         if self.provider == 'openai' and self.openai_client:
             return await self._generate_embedding_openai(text)
         else:
-            return self._generate_embedding_local(text, normalize)
+            async with self._local_encode_lock:
+                return await asyncio.to_thread(self._generate_embedding_local, text, normalize)
 
-    async def generate_embeddings_batch(
+    async def generate_embeddings_matrix(
         self,
         texts: List[str],
         normalize: bool = True,
         batch_size: Optional[int] = None,
         show_progress: bool = True
-    ) -> List[np.ndarray]:
-
+    ) -> np.ndarray:
+        """
+        Returns:
+            A contiguous (len(texts), D) float32 matrix with one embedding per
+            row, zero rows for empty texts
+        """
         if not texts:
-            return []
-
+            return np.empty((0, self.embedding_dim or 0), dtype=np.float32)
+
+        keys = [self._cache_key(text, normalize) for text in texts]
+        cached = [self._cache_get(key) for key in keys]
+
+        # Embed each distinct uncached text once
+        miss_positions = {}
+        for i, (key, embedding) in enumerate(zip(keys, cached)):
+            if embedding is None:
+                miss_positions.setdefault(key, i)
+        if not miss_positions:
+            logger.debug(f"All {len(texts)} embeddings served from cache")
+            return np.stack(cached)
+
+        miss_indices = list(miss_positions.values())
+        miss_matrix = await self._generate_embeddings_matrix_uncached(
+            [texts[i] for i in miss_indices], normalize, batch_size, show_progress
+        )
+        for i, row in zip(miss_indices, miss_matrix):
+            # Zero rows are empty texts or failures; don't pin them
+            if row.any():
+                self._cache_put(keys[i], row.copy())
+
+        if len(miss_indices) == len(texts):
+            return miss_matrix
+
+        logger.debug(f"Embedded {len(miss_indices)} of {len(texts)} texts, rest from cache")
+        matrix = np.empty((len(texts), miss_matrix.shape[1]), dtype=np.float32)
+        miss_rows = {key: row for key, row in zip(miss_positions, miss_matrix)}
+        for i, (key, embedding) in enumerate(zip(keys, cached)):
+            matrix[i] = embedding if embedding is not None else miss_rows[key]
+        return matrix
+
+    async def _generate_embeddings_matrix_uncached(
+        self,
+        texts: List[str],
+        normalize: bool,
+        batch_size: Optional[int],
+        show_progress: bool
+    ) -> np.ndarray:
         effective_batch_size = batch_size or self.batch_size
 
         if self.provider == 'openai' and self.openai_client:
-            all_embeddings = []
-            for i in range(0, len(texts), effective_batch_size):
-                batch = texts[i:i + effective_batch_size]
-                batch_embeddings = await self._generate_embeddings_batch_openai(batch)
-                all_embeddings.extend(batch_embeddings)
-
-                if i + effective_batch_size < len(texts):
-                    await asyncio.sleep(0.1)
-
-            return all_embeddings
+            # Send sub-batches concurrently; rate limits are absorbed by the
+            # retry backoff on _generate_embeddings_batch_openai
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed_batch(batch: List[str]) -> np.ndarray:
+                async with semaphore:
+                    return await self._generate_embeddings_batch_openai(batch)
+
+            offsets = range(0, len(texts), effective_batch_size)
+            results = await asyncio.gather(*[
+                embed_batch(texts[i:i + effective_batch_size]) for i in offsets
+            ])
+
+            matrix = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+            for i, batch_embeddings in zip(offsets, results):
+                matrix[i:i + len(batch_embeddings)] = batch_embeddings
+            return matrix
         else:
-            return self._generate_embeddings_batch_local(
-                texts, normalize, effective_batch_size, show_progress
-            )
+            # Model loading and inference block for seconds; run them off the
+            # event loop, one at a time since the model is shared
+            async with self._local_encode_lock:
+                return await asyncio.to_thread(
+                    self._generate_embeddings_batch_local,
+                    texts, normalize, effective_batch_size, show_progress
+                )
+
+    def _cache_key(self, text: str, normalize: bool) -> Tuple[str, bool, bytes]:
+        if self.provider == 'openai' and self.openai_client:
+            model = self.openai_model
+        else:
+            model = self.local_model_name
+        return (model, normalize, hashlib.sha256(text.encode()).digest())
+
+    def _cache_get(self, key: Tuple[str, bool, bytes]) -> Optional[np.ndarray]:
+        embedding = self._embedding_cache.get(key)
+        if embedding is not None:
+            self._embedding_cache.move_to_end(key)
+        return embedding
+
+    def _cache_put(self, key: Tuple[str, bool, bytes], embedding: np.ndarray) -> None:
+        if self.cache_size <= 0:
+            return
+        self._embedding_cache[key] = embedding
+        self._embedding_cache.move_to_end(key)
+        while len(self._embedding_cache) > self.cache_size:
+            self._embedding_cache.popitem(last=False)
 
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        normalize: bool = True,
+        batch_size: Optional[int] = None,
+        show_progress: bool = True
+    ) -> List[np.ndarray]:
+        matrix = await self.generate_embeddings_matrix(
+            texts, normalize, batch_size, show_progress
+        )
+        # Row views into the matrix, not copies
+        return list(matrix)
 
     async def cleanup(self) -> None:
         logger.info("Cleaning up EmbeddingService")
@@ -261,6 +370,8 @@ class EmbeddingService:
             self._local_model = None
             logger.debug("Cleared local embedding model reference")
 
+            self._embedding_cache.clear()
+
         except Exception as e:
             logger.warning(f"Error during EmbeddingService cleanup: {e}")
 
@@ -1,21 +1,49 @@
+import asyncio
+import asyncpg
 import torch
 import torch.nn as nn
 from torch_geometric.data import HeteroData
 from torch_geometric.nn import HeteroConv, SAGEConv
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 import logging
+import time
 from pathlib import Path
 from datetime import datetime
 
+from app.config import get_settings
 from app.services.database_service import database_service
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Column positions in the graph queries' rows. The graph build reads every
+# row by position, skipping the dict built per row by db_fetch
+USER_ID, USER_TENURE_DAYS, USER_ORG_COUNT, USER_GROUP_COUNT, USER_IS_ADMIN = range(5)
+GROUP_ID, GROUP_ORG_ID, GROUP_IS_DEFAULT, GROUP_AGE_DAYS, GROUP_MEMBER_COUNT = range(5)
+ORG_ID, ORG_AGE_DAYS, ORG_MEMBER_COUNT, ORG_GROUP_COUNT = range(4)
+
+
+class HeteroGNN(nn.ModuleList):
+    """
+    Two HeteroConv layers with a ReLU between them. Subclassing ModuleList
+    keeps the state_dict keys of checkpoints saved from a plain ModuleList.
+    """
+
+    def forward(self, x_dict, edge_index_dict):
+        x_dict = self[0](x_dict, edge_index_dict)
+        x_dict = {key: torch.relu(x) for key, x in x_dict.items()}
+        return self[1](x_dict, edge_index_dict)
+
 
 class GNNRecommendation:
     def __init__(self):
         self.hidden_dim = 64
-        self.model = self.build_model()
+        # Message passing is scatter/gather bound, so use a GPU when present
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model = self.build_model().to(self.device)
+        self.compile_model = getattr(settings, 'GNN_COMPILE', False)
+        self._compiled_model = None
 
         # ID mappings
         self.user_to_idx = {}
@@ -27,6 +55,14 @@ class GNNRecommendation:
         self.idx_to_group = {}
         self.idx_to_org = {}
 
+        # The graph and the id mappings above are rebuilt from the database
+        # only when older than graph_ttl seconds or invalidated. Rebuilds are
+        # serialized, and the mappings are replaced together with the graph
+        self.graph_ttl = getattr(settings, 'GNN_GRAPH_TTL', 300)
+        self._graph_cache: Optional[HeteroData] = None
+        self._graph_built_at = 0.0
+        self._graph_lock = asyncio.Lock()
+
         self.model_path = Path("data/models")
         self.model_path.mkdir(parents=True, exist_ok=True)
 
@@ -50,137 +86,209 @@ class GNNRecommendation:
             ('organization', 'contains_group', 'group'): SAGEConv(-1, self.hidden_dim),
         })
 
-        return nn.ModuleList([conv1, conv2])
+        return HeteroGNN([conv1, conv2])
+
+    def forward(self, x_dict, edge_index_dict):
+        """
+        Run the model, through torch.compile when GNN_COMPILE is set. The
+        SAGEConv input sizes are inferred on the first call, so compilation
+        waits until that eager call has initialized every parameter.
+        """
+        if (
+            self.compile_model
+            and self._compiled_model is None
+            and not any(nn.parameter.is_lazy(param) for param in self.model.parameters())
+        ):
+            self._compiled_model = torch.compile(self.model, dynamic=True)
+
+        model = self._compiled_model or self.model
+        return model(x_dict, edge_index_dict)
+
+    async def build_graph(self, force: bool = False) -> Optional[HeteroData]:
+        """
+        Args:
+            force: Rebuild from the database even if the cached graph is fresh
+
+        Returns:
+            The user/group/organization graph, or None if a node type is empty.
+            The id mappings describe this graph until the next await
+        """
+        if not force and self._graph_is_fresh():
+            return self._graph_cache
+
+        requested_at = time.monotonic()
+        async with self._graph_lock:
+            # Another caller may have rebuilt the graph while this one waited
+            if self._graph_cache is not None and (
+                self._graph_built_at > requested_at
+                or (not force and self._graph_is_fresh())
+            ):
+                return self._graph_cache
+
+            graph, mappings = await self._build_graph_uncached()
+            if graph is not None:
+                graph = graph.to(self.device, non_blocking=True)
+
+            # Published without an await in between, so no caller sees the
+            # mappings of one build with the graph of another
+            (
+                self.user_to_idx, self.idx_to_user,
+                self.group_to_idx, self.idx_to_group,
+                self.org_to_idx, self.idx_to_org,
+            ) = mappings
+            self._graph_cache = graph
+            self._graph_built_at = time.monotonic()
+            return graph
+
+    def _graph_is_fresh(self) -> bool:
+        return (
+            self._graph_cache is not None
+            and time.monotonic() - self._graph_built_at < self.graph_ttl
+        )
 
-    async def build_graph(self) -> HeteroData:
+    def invalidate_graph(self) -> None:
+        """Drop the cached graph, e.g. after memberships change"""
+        self._graph_cache = None
 
+    async def _build_graph_uncached(self) -> Tuple[Optional[HeteroData], Tuple[Dict, ...]]:
+        """
+        Returns:
+            The graph, or None if a node type is empty, and the new
+            (user_to_idx, idx_to_user, group_to_idx, idx_to_group, org_to_idx,
+            idx_to_org) mappings. They are filled from scratch, so rows removed
+            since the last build don't keep stale indices
+        """
         graph = HeteroData()
 
-        users_data = await self.fetch_users()
-        user_features = []
+        user_to_idx, idx_to_user = {}, {}
+        group_to_idx, idx_to_group = {}, {}
+        org_to_idx, idx_to_org = {}, {}
+        mappings = (
+            user_to_idx, idx_to_user,
+            group_to_idx, idx_to_group,
+            org_to_idx, idx_to_org,
+        )
+
+        # The five queries are independent and each takes its own pooled
+        # connection, so they run concurrently
+        (
+            users_data,
+            groups_data,
+            orgs_data,
+            user_org_memberships,
+            user_group_memberships,
+        ) = await asyncio.gather(
+            self.fetch_users(),
+            self.fetch_groups(),
+            self.fetch_organizations(),
+            self.fetch_user_org_memberships(),
+            self.fetch_user_group_memberships(),
+        )
 
         if not users_data:
             logger.warning("No users found in database")
-            return None
+            return None, mappings
 
+        # Features are written straight into one float32 array per node type
+        # and wrapped without another copy
+        user_features = np.empty((len(users_data), 4), dtype=np.float32)
         for i, user in enumerate(users_data):
-            self.user_to_idx[user['id']] = i
-            self.idx_to_user[i] = user['id']
+            user_to_idx[user[USER_ID]] = i
+            idx_to_user[i] = user[USER_ID]
 
-            features = [
-                float(user['org_count']),
-                float(user['group_count']),
-                float(user['tenure_days']),
-                float(user['is_admin_anywhere'])
-            ]
-            user_features.append(features)
+            user_features[i] = (
+                float(user[USER_ORG_COUNT]),
+                float(user[USER_GROUP_COUNT]),
+                float(user[USER_TENURE_DAYS]),
+                float(user[USER_IS_ADMIN])
+            )
 
-        graph['user'].x = torch.tensor(user_features, dtype=torch.float)
-
-        groups_data = await self.fetch_groups()
-        group_features = []
+        graph['user'].x = torch.from_numpy(user_features)
 
         if not groups_data:
             logger.warning("No groups found in database")
-            return None
+            return None, mappings
 
+        group_features = np.empty((len(groups_data), 3), dtype=np.float32)
         for i, group in enumerate(groups_data):
-            self.group_to_idx[group['id']] = i
-            self.idx_to_group[i] = group['id']
-
-            features = [
-                float(group['member_count']),
-                float(group['is_default']),
-                float(group['age_days'])
-            ]
-            group_features.append(features)
+            group_to_idx[group[GROUP_ID]] = i
+            idx_to_group[i] = group[GROUP_ID]
 
-        graph['group'].x = torch.tensor(group_features, dtype=torch.float)
+            group_features[i] = (
+                float(group[GROUP_MEMBER_COUNT]),
+                float(group[GROUP_IS_DEFAULT]),
+                float(group[GROUP_AGE_DAYS])
+            )
 
-        orgs_data = await self.fetch_organizations()
-        org_features = []
+        graph['group'].x = torch.from_numpy(group_features)
 
         if not orgs_data:
             logger.warning("No organizations found in database")
-            return None
+            return None, mappings
 
+        org_features = np.empty((len(orgs_data), 3), dtype=np.float32)
         for i, org in enumerate(orgs_data):
-            self.org_to_idx[org['id']] = i
-            self.idx_to_org[i] = org['id']
+            org_to_idx[org[ORG_ID]] = i
+            idx_to_org[i] = org[ORG_ID]
 
-            features = [
-                float(org['member_count']),
-                float(org['group_count']),
-                float(org['age_days'])
-            ]
-            org_features.append(features)
+            org_features[i] = (
+                float(org[ORG_MEMBER_COUNT]),
+                float(org[ORG_GROUP_COUNT]),
+                float(org[ORG_AGE_DAYS])
+            )
 
-        graph['organization'].x = torch.tensor(org_features, dtype=torch.float)
+        graph['organization'].x = torch.from_numpy(org_features)
 
         # User-Organization memberships
-        user_org_edges = []
-        org_user_edges = []
-        for membership in await self.fetch_user_org_memberships():
-            if membership['user_id'] in self.user_to_idx and membership['org_id'] in self.org_to_idx:
-                user_idx = self.user_to_idx[membership['user_id']]
-                org_idx = self.org_to_idx[membership['org_id']]
-                user_org_edges.append([user_idx, org_idx])
-                org_user_edges.append([org_idx, user_idx])
-
-        if user_org_edges:
-            graph['user', 'member_of', 'organization'].edge_index = torch.tensor(
-                user_org_edges, dtype=torch.long
-            ).t()
-            graph['organization', 'has_member', 'user'].edge_index = torch.tensor(
-                org_user_edges, dtype=torch.long
-            ).t()
-        else:
-            graph['user', 'member_of', 'organization'].edge_index = torch.zeros((2, 0), dtype=torch.long)
-            graph['organization', 'has_member', 'user'].edge_index = torch.zeros((2, 0), dtype=torch.long)
+        user_org_edges = self._build_edge_index(
+            user_org_memberships, user_to_idx, org_to_idx
+        )
+        graph['user', 'member_of', 'organization'].edge_index = user_org_edges
+        graph['organization', 'has_member', 'user'].edge_index = user_org_edges.flip(0)
 
         # User-Group memberships
-        user_group_edges = []
-        group_user_edges = []
-        for membership in await self.fetch_user_group_memberships():
-            if membership['user_id'] in self.user_to_idx and membership['group_id'] in self.group_to_idx:
-                user_idx = self.user_to_idx[membership['user_id']]
-                group_idx = self.group_to_idx[membership['group_id']]
-                user_group_edges.append([user_idx, group_idx])
-                group_user_edges.append([group_idx, user_idx])
-
-        if user_group_edges:
-            graph['user', 'belongs_to', 'group'].edge_index = torch.tensor(
-                user_group_edges, dtype=torch.long
-            ).t()
-            graph['group', 'contains', 'user'].edge_index = torch.tensor(
-                group_user_edges, dtype=torch.long
-            ).t()
-        else:
-            graph['user', 'belongs_to', 'group'].edge_index = torch.zeros((2, 0), dtype=torch.long)
-            graph['group', 'contains', 'user'].edge_index = torch.zeros((2, 0), dtype=torch.long)
+        user_group_edges = self._build_edge_index(
+            user_group_memberships, user_to_idx, group_to_idx
+        )
+        graph['user', 'belongs_to', 'group'].edge_index = user_group_edges
+        graph['group', 'contains', 'user'].edge_index = user_group_edges.flip(0)
 
         # Group-Organization relationships
-        group_org_edges = []
-        org_group_edges = []
-        for group in groups_data:
-            if group['id'] in self.group_to_idx and group['org_id'] in self.org_to_idx:
-                group_idx = self.group_to_idx[group['id']]
-                org_idx = self.org_to_idx[group['org_id']]
-                group_org_edges.append([group_idx, org_idx])
-                org_group_edges.append([org_idx, group_idx])
-
-        if group_org_edges:
-            graph['group', 'part_of', 'organization'].edge_index = torch.tensor(
-                group_org_edges, dtype=torch.long
-            ).t()
-            graph['organization', 'contains_group', 'group'].edge_index = torch.tensor(
-                org_group_edges, dtype=torch.long
-            ).t()
-        else:
-            graph['group', 'part_of', 'organization'].edge_index = torch.zeros((2, 0), dtype=torch.long)
-            graph['organization', 'contains_group', 'group'].edge_index = torch.zeros((2, 0), dtype=torch.long)
-
-        return graph
+        group_org_edges = self._build_edge_index(
+            ((group[GROUP_ID], group[GROUP_ORG_ID]) for group in groups_data),
+            group_to_idx, org_to_idx
+        )
+        graph['group', 'part_of', 'organization'].edge_index = group_org_edges
+        graph['organization', 'contains_group', 'group'].edge_index = group_org_edges.flip(0)
+
+        return graph, mappings
+
+    def _build_edge_index(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        src_to_idx: Dict[str, int],
+        dst_to_idx: Dict[str, int]
+    ) -> torch.Tensor:
+        """
+        Args:
+            pairs: (source id, destination id) tuples
+            src_to_idx: Node index of each source id
+            dst_to_idx: Node index of each destination id
+
+        Returns:
+            A (2, E) edge_index of the pairs whose endpoints are both in the
+            graph, filled through one int64 array instead of nested lists
+        """
+        def endpoints():
+            for src, dst in pairs:
+                src_idx = src_to_idx.get(src)
+                dst_idx = dst_to_idx.get(dst)
+                if src_idx is not None and dst_idx is not None:
+                    yield src_idx
+                    yield dst_idx
+
+        edges = np.fromiter(endpoints(), dtype=np.int64).reshape(-1, 2)
+        return torch.from_numpy(np.ascontiguousarray(edges.T))
 
     async def db_fetch(self, query: str, *args) -> List[Dict]:
         if not database_service.pool:
@@ -190,6 +298,17 @@ class GNNRecommendation:
             rows = await conn.fetch(query, *args)
             return [dict(row) for row in rows]
 
+    async def db_fetch_raw(self, query: str, *args) -> List[asyncpg.Record]:
+        """
+        Like db_fetch, but returns the records themselves for callers that
+        read columns by position or unpack them as tuples
+        """
+        if not database_service.pool:
+            await database_service.connect()
+
+        async with database_service.pool.acquire() as conn:
+            return await conn.fetch(query, *args)
+
     async def fetch_users(self):
         query = """
         SELECT
@@ -203,7 +322,7 @@ class GNNRecommendation:
         LEFT JOIN "GroupMembership" gm ON u.id = gm."userId"
         GROUP BY u.id, u."createdAt"
         """
-        return await self.db_fetch(query)
+        return await self.db_fetch_raw(query)
 
     async def fetch_groups(self):
         query = """
@@ -217,7 +336,7 @@ class GNNRecommendation:
         LEFT JOIN "GroupMembership" gm ON g.id = gm."groupId"
         GROUP BY g.id, g."organizationId", g."isDefault", g."createdAt"
         """
-        return await self.db_fetch(query)
+        return await self.db_fetch_raw(query)
 
     async def fetch_organizations(self):
         query = """
@@ -231,21 +350,21 @@ class GNNRecommendation:
         LEFT JOIN "Group" g ON o.id = g."organizationId"
         GROUP BY o.id, o."createdAt"
         """
-        return await self.db_fetch(query)
+        return await self.db_fetch_raw(query)
 
     async def fetch_user_org_memberships(self):
         query = """
         SELECT "userId" as user_id, "organizationId" as org_id
         FROM "OrganizationMembership"
         """
-        return await self.db_fetch(query)
+        return await self.db_fetch_raw(query)
 
     async def fetch_user_group_memberships(self):
         query = """
         SELECT "userId" as user_id, "groupId" as group_id
         FROM "GroupMembership"
         """
-        return await self.db_fetch(query)
+        return await self.db_fetch_raw(query)
 
     async def train_gnn(self, num_epochs=50):
 
@@ -255,79 +374,80 @@ class GNNRecommendation:
             logger.warning("No training data found")
             return
 
-        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.01)
-
-        for epoch in range(num_epochs):
-            self.model.train()
-            total_loss = 0
-            valid_examples = 0
-
-            # Build current graph
-            graph = await self.build_graph()
+        # The graph is static during training, so it is built once from
+        # current data and shared by every epoch
+        graph = await self.build_graph(force=True)
 
-            if graph is None:
-                logger.warning("Graph building failed - skipping training epoch")
-                continue
+        if graph is None:
+            logger.warning("Graph building failed - skipping training")
+            return
 
-            if graph['user'].x.size(0) == 0 or graph['group'].x.size(0) == 0 or graph['organization'].x.size(0) == 0:
-                logger.warning("Empty graph detected - skipping training epoch")
-                continue
+        if graph['user'].x.size(0) == 0 or graph['group'].x.size(0) == 0 or graph['organization'].x.size(0) == 0:
+            logger.warning("Empty graph detected - skipping training")
+            return
 
-            # Forward pass through both layers
-            x_dict = {
-                'user': graph['user'].x,
-                'group': graph['group'].x,
-                'organization': graph['organization'].x
-            }
+        training_tensors = self._materialize_training_tensors(positive_examples)
+        if training_tensors is None:
+            logger.warning("No valid training examples found")
+            return
+        user_index, group_index, targets = training_tensors
 
-            edge_index_dict = {
-                ('user', 'member_of', 'organization'): graph['user', 'member_of', 'organization'].edge_index,
-                ('organization', 'has_member', 'user'): graph['organization', 'has_member', 'user'].edge_index,
-                ('user', 'belongs_to', 'group'): graph['user', 'belongs_to', 'group'].edge_index,
-                ('group', 'contains', 'user'): graph['group', 'contains', 'user'].edge_index,
-                ('group', 'part_of', 'organization'): graph['group', 'part_of', 'organization'].edge_index,
-                ('organization', 'contains_group', 'group'): graph['organization', 'contains_group', 'group'].edge_index,
-            }
+        # The graph is static, so its feature and edge dicts are shared by
+        # every epoch
+        node_features = graph.x_dict
+        edge_index_dict = graph.edge_index_dict
 
-            # Layer 1
-            x_dict = self.model[0](x_dict, edge_index_dict)
-            x_dict = {key: torch.relu(x) for key, x in x_dict.items()}
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.01)
 
-            # Layer 2
-            x_dict = self.model[1](x_dict, edge_index_dict)
+        for epoch in range(num_epochs):
+            self.model.train()
 
-            # Calculate loss for each training example
-            for example in positive_examples:
-                user_id = example['userId']
-                group_id = example['groupId']
-                joined = example['joined']
+            x_dict = self.forward(node_features, edge_index_dict)
 
-                if user_id not in self.user_to_idx or group_id not in self.group_to_idx:
-                    continue
+            # Score every (user, group) example at once
+            user_emb = x_dict['user'].index_select(0, user_index)
+            group_emb = x_dict['group'].index_select(0, group_index)
+            scores = (user_emb * group_emb).sum(dim=-1)
+            loss = nn.functional.binary_cross_entropy_with_logits(scores, targets)
 
-                user_idx = self.user_to_idx[user_id]
-                group_idx = self.group_to_idx[group_id]
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
 
-                user_emb = x_dict['user'][user_idx]
-                group_emb = x_dict['group'][group_idx]
+            if epoch % 10 == 0:
+                logger.info(f"Epoch {epoch}: Avg Loss = {loss.item():.4f}")
 
-                score = torch.dot(user_emb, group_emb)
+    def _materialize_training_tensors(
+        self, examples: List[Dict]
+    ) -> Optional[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]]:
+        """
+        Map training examples onto the current graph once, so epochs do no
+        per-example dict lookups.
 
-                target = torch.tensor(1.0 if joined else 0.0)
-                loss = nn.functional.binary_cross_entropy_with_logits(score.unsqueeze(0), target.unsqueeze(0))
-                total_loss += loss
-                valid_examples += 1
+        Returns:
+            User index, group index and float target tensors for the examples
+            whose user and group are both in the graph, or None if none are
+        """
+        user_indices = []
+        group_indices = []
+        targets = []
+        for example in examples:
+            user_idx = self.user_to_idx.get(example['userId'])
+            group_idx = self.group_to_idx.get(example['groupId'])
+            if user_idx is None or group_idx is None:
+                continue
+            user_indices.append(user_idx)
+            group_indices.append(group_idx)
+            targets.append(1.0 if example['joined'] else 0.0)
 
-            if valid_examples > 0:
-                optimizer.zero_grad()
-                total_loss.backward()
-                optimizer.step()
+        if not targets:
+            return None
 
-                if epoch % 10 == 0:
-                    avg_loss = total_loss.item() / valid_examples
-                    logger.info(f"Epoch {epoch}: Avg Loss = {avg_loss:.4f}")
-            else:
-                logger.warning(f"Epoch {epoch}: No valid examples found")
+        return (
+            torch.tensor(user_indices, dtype=torch.long, device=self.device),
+            torch.tensor(group_indices, dtype=torch.long, device=self.device),
+            torch.tensor(targets, dtype=torch.float, device=self.device),
+        )
 
     async def get_training_data(self) -> List[Dict]:
 
@@ -340,16 +460,31 @@ class GNNRecommendation:
 
         positives = await self.db_fetch(positive_query)
 
-        # sample users who could join groups but didn't
+        # sample users who could join groups but didn't. Memberships are
+        # sampled first (a bounded top-N sort over one table), then each gets a
+        # few random groups of its organization, instead of sorting the whole
+        # user x group product
         negative_query = """
-        SELECT u.id as "userId", g.id as "groupId", false as joined
-        FROM "User" u
-        CROSS JOIN "Group" g
-        JOIN "OrganizationMembership" om ON u.id = om."userId" AND g."organizationId" = om."organizationId"
-        LEFT JOIN "GroupMembership" gm ON u.id = gm."userId" AND g.id = gm."groupId"
-        WHERE gm.id IS NULL  -- User is not in this group
-        AND g."isDefault" = false  -- Skip default groups
-        ORDER BY RANDOM()
+        WITH sampled_memberships AS (
+            SELECT om."userId", om."organizationId"
+            FROM "OrganizationMembership" om
+            ORDER BY RANDOM()
+            LIMIT 1000
+        )
+        SELECT sm."userId", g.id as "groupId", false as joined
+        FROM sampled_memberships sm
+        CROSS JOIN LATERAL (
+            SELECT g.id
+            FROM "Group" g
+            WHERE g."organizationId" = sm."organizationId"
+            AND g."isDefault" = false  -- Skip default groups
+            AND NOT EXISTS (  -- User is not in this group
+                SELECT 1 FROM "GroupMembership" gm
+                WHERE gm."userId" = sm."userId" AND gm."groupId" = g.id
+            )
+            ORDER BY RANDOM()
+            LIMIT 5
+        ) g
         LIMIT 1000
         """
 
@@ -359,83 +494,88 @@ class GNNRecommendation:
 
     async def recommend_users_for_group(self, group_id: str, limit: int = 10) -> List[Dict]:
 
+        graph = await self.build_graph()
+
         if group_id not in self.group_to_idx:
             # Rebuild graph to include new groups
-            await self.build_graph()
+            graph = await self.build_graph(force=True)
 
             if group_id not in self.group_to_idx:
                 logger.warning(f"Group {group_id} not found")
                 return []
 
-        self.model.eval()
+        # Another caller may rebuild the graph while this one awaits below, so
+        # scores are mapped through the mappings built with this graph
+        user_to_idx, idx_to_user, group_to_idx = self.user_to_idx, self.idx_to_user, self.group_to_idx
 
-        # Build current graph
-        graph = await self.build_graph()
+        if graph is None:
+            logger.warning("Graph building failed - no recommendations")
+            return []
+
+        self.model.eval()
 
         # Forward pass
         with torch.no_grad():
-            x_dict = {
-                'user': graph['user'].x,
-                'group': graph['group'].x,
-                'organization': graph['organization'].x
-            }
-
-            edge_index_dict = {
-                ('user', 'member_of', 'organization'): graph['user', 'member_of', 'organization'].edge_index,
-                ('organization', 'has_member', 'user'): graph['organization', 'has_member', 'user'].edge_index,
-                ('user', 'belongs_to', 'group'): graph['user', 'belongs_to', 'group'].edge_index,
-                ('group', 'contains', 'user'): graph['group', 'contains', 'user'].edge_index,
-                ('group', 'part_of', 'organization'): graph['group', 'part_of', 'organization'].edge_index,
-                ('organization', 'contains_group', 'group'): graph['organization', 'contains_group', 'group'].edge_index,
-            }
-
-            # Forward through model
-            x_dict = self.model[0](x_dict, edge_index_dict)
-            x_dict = {key: torch.relu(x) for key, x in x_dict.items()}
-            x_dict = self.model[1](x_dict, edge_index_dict)
+            x_dict = self.forward(graph.x_dict, graph.edge_index_dict)
 
         # Get target group embedding
-        group_idx = self.group_to_idx[group_id]
+        group_idx = group_to_idx[group_id]
         group_emb = x_dict['group'][group_idx]
 
         # Calculate scores for all users
         user_embeddings = x_dict['user']
-        scores = torch.mm(user_embeddings, group_emb.unsqueeze(1)).squeeze()
+        scores = torch.mv(user_embeddings, group_emb)
 
         # Get users not already in this group
         current_members = await self.get_current_group_members(group_id)
-        current_member_indices = [self.user_to_idx[uid] for uid in current_members if uid in self.user_to_idx]
+        current_member_indices = [user_to_idx[uid] for uid in current_members if uid in user_to_idx]
 
         # Set current members' scores to -infinity so they don't get recommended
-        for idx in current_member_indices:
-            scores[idx] = float('-inf')
+        if current_member_indices:
+            member_index = torch.tensor(current_member_indices, dtype=torch.long, device=scores.device)
+            scores.index_fill_(0, member_index, float('-inf'))
 
-        # Get top recommendations
-        num_users = len(scores)
-        top_k = min(limit, num_users)
+        # Get top recommendations. Only non-members are eligible, so asking
+        # for at most that many never returns a masked score
+        num_candidates = len(scores) - len(current_member_indices)
+        top_k = min(limit, num_candidates)
 
-        if top_k == 0:
+        if top_k <= 0:
             return []
 
         top_scores, top_indices = torch.topk(scores, top_k)
 
+        # Convert to probabilities and copy to Python in one go, not per row
+        candidates = [
+            (idx_to_user[user_idx], probability)
+            for probability, user_idx in zip(
+                torch.sigmoid(top_scores).tolist(), top_indices.tolist()
+            )
+        ]
+
+        # User info and explanation inputs for every candidate in two queries
+        # instead of several per candidate
+        group_org, candidate_rows = await asyncio.gather(
+            self.get_group_organization(group_id),
+            self.get_candidate_details([user_id for user_id, _ in candidates], group_id),
+        )
+        details = {row['id']: row for row in candidate_rows}
+
         # Convert back to user IDs and get user info
         recommendations = []
 
-        for score, user_idx in zip(top_scores, top_indices):
-            if score == float('-inf'):
-                continue
-
-            user_id = self.idx_to_user[user_idx.item()]
-            user_info = await self.get_user_info(user_id)
+        for user_id, score in candidates:
+            user_info = details.get(user_id)
 
             if user_info:
                 recommendations.append({
                     'userId': user_id,
                     'userName': user_info.get('name', 'Unknown'),
                     'userEmail': user_info.get('email', ''),
-                    'score': torch.sigmoid(score).item(),  # Convert to probability
-                    'reason': await self.explain_recommendation(user_id, group_id)
+                    'score': score,
+                    'reason': self._format_reason(
+                        group_org, user_info['in_group_org'], user_info['shared_connections']
+                    )
                 })
 
         return recommendations
@@ -445,16 +585,52 @@ class GNNRecommendation:
         group_org = await self.get_group_organization(group_id)
         user_orgs = await self.get_user_organizations(user_id)
 
-        if group_org and group_org.get('id') in user_orgs:
-            shared_connections = await self.find_shared_group_connections(user_id, group_id)
+        in_group_org = bool(group_org) and group_org.get('id') in user_orgs
+        shared_connections = 0
+        if in_group_org:
+            shared_connections = len(await self.find_shared_group_connections(user_id, group_id))
 
+        return self._format_reason(group_org, in_group_org, shared_connections)
+
+    def _format_reason(self, group_org: Dict, in_group_org: bool, shared_connections: int) -> str:
+        if group_org and in_group_org:
             if shared_connections:
-                return f"Works with {len(shared_connections)} current members in other groups"
+                return f"Works with {shared_connections} current members in other groups"
             else:
                 return f"Member of {group_org.get('name', 'the same')} organization"
 
         return "Similar profile to current group members"
 
+    async def get_candidate_details(self, user_ids: List[str], group_id: str) -> List[Dict]:
+        """
+        Returns:
+            id, name and email of each user, whether they belong to the group's
+            organization, and how many of the group's members share another
+            group with them
+        """
+        query = '''
+        SELECT
+            u.id,
+            u.name,
+            u.email,
+            EXISTS (
+                SELECT 1
+                FROM "OrganizationMembership" om
+                JOIN "Group" g ON g."organizationId" = om."organizationId"
+                WHERE om."userId" = u.id AND g.id = $2
+            ) as in_group_org,
+            (
+                SELECT COUNT(DISTINCT gm."userId")
+                FROM "GroupMembership" ug
+                JOIN "GroupMembership" gm ON gm."groupId" = ug."groupId"
+                JOIN "GroupMembership" tgm ON tgm."userId" = gm."userId" AND tgm."groupId" = $2
+                WHERE ug."userId" = u.id AND gm."userId" != u.id
+            ) as shared_connections
+        FROM "User" u
+        WHERE u.id = ANY($1::text[])
+        '''
+        return await self.db_fetch(query, user_ids, group_id)
+
     async def get_current_group_members(self, group_id: str) -> List[str]:
         query = 'SELECT "userId" FROM "GroupMembership" WHERE "groupId" = $1'
         rows = await self.db_fetch(query, group_id)
@@ -517,12 +693,33 @@ class GNNRecommendation:
             'hidden_dim': self.hidden_dim
         }
 
+        # Snapshot the graph the mappings describe, so a restart can serve
+        # recommendations without rebuilding it from the database
+        if self._graph_cache is not None:
+            checkpoint['graph_x'] = {
+                node_type: self._graph_cache[node_type].x.cpu()
+                for node_type in self._graph_cache.node_types
+            }
+            checkpoint['graph_edges'] = {
+                edge_type: self._graph_cache[edge_type].edge_index.cpu()
+                for edge_type in self._graph_cache.edge_types
+            }
+
         torch.save(checkpoint, filepath)
         logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath: str = None) -> bool:
+    def load_model(self, filepath: str = None, load_graph: bool = True) -> bool:
+        """
+        Args:
+            filepath: Checkpoint written by save_model
+            load_graph: Serve the checkpoint's graph snapshot until it expires,
+                instead of rebuilding the graph on first use
+
+        Returns:
+            True if a checkpoint was loaded
+        """
         if filepath is None:
-            filepath = self.model_path / "simple_gnn_model.pt"
+            filepath = self.model_path / "gnn_model.pt"
 
         if not Path(filepath).exists():
             logger.info(f"No saved model found at {filepath}")
@@ -531,7 +728,8 @@ class GNNRecommendation:
         checkpoint = torch.load(filepath, map_location='cpu')
 
         self.hidden_dim = checkpoint['hidden_dim']
-        self.model = self.build_model()
+        self.model = self.build_model().to(self.device)
+        self._compiled_model = None
         self.model.load_state_dict(checkpoint['model_state_dict'])
 
         self.user_to_idx = checkpoint['user_to_idx']
@@ -541,5 +739,15 @@ class GNNRecommendation:
         self.idx_to_group = checkpoint.get('idx_to_group', {})
         self.idx_to_org = checkpoint.get('idx_to_org', {})
 
+        self.invalidate_graph()
+        if load_graph and 'graph_x' in checkpoint and 'graph_edges' in checkpoint:
+            graph = HeteroData()
+            for node_type, x in checkpoint['graph_x'].items():
+                graph[node_type].x = x
+            for edge_type, edge_index in checkpoint['graph_edges'].items():
+                graph[edge_type].edge_index = edge_index
+            self._graph_cache = graph.to(self.device)
+            self._graph_built_at = time.monotonic()
+
         logger.info(f"Model loaded from {filepath}")
         return True
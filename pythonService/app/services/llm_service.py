@@ -1,9 +1,13 @@
+import asyncio
 import logging
+from typing import AsyncIterator
+
 import google.generativeai as genai
+import orjson
 from tenacity import retry, stop_after_attempt, retry_if_exception_type
 
 from app.config import get_settings
-from ollama import chat
+from ollama import AsyncClient
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -28,6 +32,12 @@ class LLMService:
             genai.configure(api_key=settings.GOOGLE_API_KEY)
             self.gemini_client = genai.GenerativeModel(self.gemini_model)
 
+        self.ollama_client = AsyncClient()
+
+        # Bound in-flight requests so concurrent callers stay under provider rate limits
+        self.max_concurrency = getattr(settings, 'LLM_MAX_CONCURRENCY', 8)
+        self.request_semaphore = asyncio.Semaphore(self.max_concurrency)
+
     @retry(
         stop=stop_after_attempt(2),
         retry=retry_if_exception_type((Exception,))
@@ -61,7 +71,7 @@ class LLMService:
 
     async def _call_ollama_model(self, prompt: str, **kwargs) -> str:
         try:
-            response = chat(
+            response = await self.ollama_client.chat(
                 model=kwargs.get("model", self.ollama_model),
                 messages=[{"role": "user", "content": prompt}],
                 keep_alive="1h",
@@ -80,12 +90,69 @@ class LLMService:
             logger.error(f"Error calling Ollama model: {e}")
             raise
 
+    async def _stream_gemini_model(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        generation_config = genai.types.GenerationConfig(
+            temperature=kwargs.get("temperature", self.gemini_temperature),
+            max_output_tokens=kwargs.get("max_tokens", self.gemini_max_tokens),
+            top_p=kwargs.get("top_p", 0.95),
+            top_k=kwargs.get("top_k", 64),
+        )
+
+        response = await self.gemini_client.generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            stream=True
+        )
+
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def _stream_ollama_model(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        stream = await self.ollama_client.chat(
+            model=kwargs.get("model", self.ollama_model),
+            messages=[{"role": "user", "content": prompt}],
+            keep_alive="1h",
+            stream=True,
+            options={
+                "num_ctx": kwargs.get("max_tokens", self.max_tokens),
+                "temperature": kwargs.get("temperature", self.temperature),
+                "min_p": kwargs.get("min_p", 0.0),
+                "repeat_penalty": kwargs.get("repeat_penalty", 1.0),
+                "top_k": kwargs.get("top_k", 64),
+                "top_p": kwargs.get("top_p", 0.95),
+            },
+        )
+
+        async for part in stream:
+            if part.message.content:
+                yield part.message.content
+
+    async def stream_model(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Yield the model response as text fragments while it is being decoded
+        """
+        try:
+            async with self.request_semaphore:
+                if self.provider == 'gemini' and self.gemini_client:
+                    stream = self._stream_gemini_model(prompt, **kwargs)
+                else:
+                    stream = self._stream_ollama_model(prompt, **kwargs)
+
+                async for text in stream:
+                    yield text
+
+        except Exception as e:
+            logger.error(f"Error streaming LLM model with provider {self.provider}: {e}")
+            raise
+
     async def call_model(self, prompt: str, **kwargs) -> str:
         try:
-            if self.provider == 'gemini' and self.gemini_client:
-                return await self._call_gemini_model(prompt, **kwargs)
-            else:
-                return await self._call_ollama_model(prompt, **kwargs)
+            async with self.request_semaphore:
+                if self.provider == 'gemini' and self.gemini_client:
+                    return await self._call_gemini_model(prompt, **kwargs)
+                else:
+                    return await self._call_ollama_model(prompt, **kwargs)
 
         except Exception as e:
             logger.error(f"Error calling LLM model with provider {self.provider}: {e}")
@@ -129,9 +196,8 @@ class LLMService:
             response = await self.call_model(prompt, temperature=0.3)
             logger.info(f"QUERY ENHANCEMENT RESPONSE:\n{response}")
 
-            import json
             try:
-                enhanced_queries = json.loads(response.strip())
+                enhanced_queries = orjson.loads(response.strip())
                 if isinstance(enhanced_queries, list) and len(enhanced_queries) > 0:
                     if query not in enhanced_queries:
                         enhanced_queries.insert(0, query)
@@ -139,7 +205,7 @@ class LLMService:
                 else:
                     logger.warning("LLM returned invalid query enhancement format, using original query")
                     return [query]
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logger.warning("Failed to parse LLM query enhancement response, using original query")
                 return [query]
 
@@ -200,9 +266,8 @@ class LLMService:
             response = await self.call_model(prompt, temperature=0.1)
             logger.info(f"CONTEXT SELECTION RESPONSE:\n{response}")
 
-            import json
             try:
-                selected_indices = json.loads(response.strip())
+                selected_indices = orjson.loads(response.strip())
                 if isinstance(selected_indices, list):
                     selected_chunks = []
                     for idx in selected_indices:
@@ -226,7 +291,7 @@ class LLMService:
                 else:
                     logger.warning("LLM returned invalid context selection format")
                     return sorted(candidates[:3], key=lambda x: x['score'], reverse=True)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logger.warning("Failed to parse LLM context selection response")
                 return sorted(candidates[:3], key=lambda x: x['score'], reverse=True)
 
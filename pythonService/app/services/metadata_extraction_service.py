@@ -1,9 +1,14 @@
+import asyncio
 import logging
-import json
 from typing import Dict, Any, List, Optional
+
+import orjson
+
+from app.config import get_settings
 from app.services.llm_service import llm_service
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class MetadataExtractionService:
@@ -12,6 +17,8 @@ class MetadataExtractionService:
     def __init__(self):
         self.extraction_prompt = self._get_extraction_prompt()
         self.batch_extraction_prompt = self._get_batch_extraction_prompt()
+        self.chunk_batch_extraction_prompt = self._get_chunk_batch_extraction_prompt()
+        self.batch_size = getattr(settings, 'METADATA_BATCH_SIZE', 20)
 
     def _get_extraction_prompt(self) -> str:
         """Get the single chunk metadata extraction prompt"""
@@ -66,6 +73,35 @@ Return metadata in this exact JSON format:
     "entities": ["entity1", "entity2", ...],
     "document_type": "type"
 }}
+""".strip()
+
+    def _get_chunk_batch_extraction_prompt(self) -> str:
+        """Get the prompt for extracting metadata from several chunks in one request"""
+        return """
+You are a metadata extraction specialist. Extract structured metadata from each of the given document chunks.
+
+<instructions>
+    <instruction>For each chunk, extract 3-5 relevant keywords that capture the main concepts</instruction>
+    <instruction>For each chunk, identify 1-3 high-level topics or themes</instruction>
+    <instruction>For each chunk, extract any named entities (people, organizations, locations, products)</instruction>
+    <instruction>For each chunk, determine the document type (e.g., "technical documentation", "research paper", "business report", "legal document", "email", "presentation", "article", "manual")</instruction>
+    <instruction>Return ONLY a valid JSON array with exactly {count} objects, one per chunk, in chunk order</instruction>
+    <instruction>Be concise - keywords should be 1-3 words, topics should be brief phrases</instruction>
+</instructions>
+
+Here are the document chunks to analyze:
+{chunks}
+
+Return metadata in this exact JSON format:
+[
+    {{
+        "keywords": ["keyword1", "keyword2", ...],
+        "topics": ["topic1", "topic2", ...],
+        "entities": ["entity1", "entity2", ...],
+        "document_type": "type"
+    }},
+    ...
+]
 """.strip()
 
     async def extract_metadata(self, chunk: str, context: str = "") -> Dict[str, Any]:
@@ -96,6 +132,82 @@ Return metadata in this exact JSON format:
             logger.error(f"Error extracting metadata from chunk: {e}")
             return self._get_default_metadata()
 
+    async def extract_metadata_batch(self, chunks: List[str], context: str = "") -> List[Dict[str, Any]]:
+        """
+        Extract metadata for many chunks with one LLM request per batch of
+        chunks instead of one request per chunk
+
+        Args:
+            chunks: The chunk texts to analyze
+            context: Optional context shared by all chunks
+
+        Returns:
+            One metadata dictionary per chunk, in chunk order
+        """
+        batches = [
+            chunks[start:start + self.batch_size]
+            for start in range(0, len(chunks), self.batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._extract_metadata_for_batch(batch, context) for batch in batches)
+        )
+        return [metadata for batch_metadata in results for metadata in batch_metadata]
+
+    async def _extract_metadata_for_batch(self, chunks: List[str], context: str) -> List[Dict[str, Any]]:
+        if len(chunks) == 1:
+            return [await self.extract_metadata(chunks[0], context)]
+
+        try:
+            # Same per-chunk budget as extract_metadata
+            max_chars = 4000
+            chunk_sections = []
+            for i, chunk in enumerate(chunks):
+                if len(chunk) > max_chars:
+                    chunk = chunk[:max_chars] + "..."
+                chunk_sections.append(f'<chunk index="{i}">\n{chunk}\n</chunk>')
+            chunks_text = "\n".join(chunk_sections)
+            if context:
+                chunks_text = f"<context>\n{context}\n</context>\n{chunks_text}"
+
+            prompt = self.chunk_batch_extraction_prompt.format(count=len(chunks), chunks=chunks_text)
+            response = await llm_service.call_model(prompt)
+
+            metadata_list = self._parse_json_array_response(response, len(chunks))
+            if metadata_list is not None:
+                return metadata_list
+
+        except Exception as e:
+            logger.error(f"Error extracting metadata from chunk batch: {e}")
+
+        logger.warning(f"Falling back to per-chunk metadata extraction for {len(chunks)} chunks")
+        return list(await asyncio.gather(
+            *(self.extract_metadata(chunk, context) for chunk in chunks)
+        ))
+
+    def _parse_json_array_response(self, response: str, expected: int) -> Optional[List[Dict[str, Any]]]:
+        """Parse a JSON array of per-chunk metadata, or None if it is unusable"""
+        cleaned = response.strip()
+        start = cleaned.find("[")
+        end = cleaned.rfind("]") + 1
+        if start < 0 or end <= start:
+            logger.error(f"No metadata JSON array in response: {response[:200]}...")
+            return None
+
+        try:
+            items = orjson.loads(cleaned[start:end])
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Failed to parse metadata JSON array: {response[:200]}... Error: {e}")
+            return None
+
+        if not isinstance(items, list) or len(items) != expected:
+            logger.error(f"Expected metadata for {expected} chunks, got {len(items) if isinstance(items, list) else 0}")
+            return None
+
+        return [
+            self._validate_metadata(item) if isinstance(item, dict) else self._get_default_metadata()
+            for item in items
+        ]
+
     def _parse_json_response(self, response: str) -> Dict[str, Any]:
         """Parse and validate JSON response from LLM"""
         try:
@@ -123,11 +235,11 @@ Return metadata in this exact JSON format:
                 if json_match:
                     cleaned = json_match.group(0)
 
-            metadata = json.loads(cleaned)
+            metadata = orjson.loads(cleaned)
 
             return self._validate_metadata(metadata)
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse metadata JSON: {response[:200]}... Error: {e}")
             return self._extract_fallback_metadata(response)
         except Exception as e:
@@ -91,13 +91,13 @@ class SearchIndexBuilderService:
             try:
                 logger.info(f"Building indexes for organization {organization_id}")
 
-                chunks_data = (
-                    await database_service.get_chunks_and_embeddings_for_organization(
+                embedding_data = (
+                    await database_service.get_embedding_matrix_for_organization(
                         organization_id
                     )
                 )
 
-                if not chunks_data:
+                if not embedding_data["chunk_count"]:
                     logger.warning(
                         f"No chunks found for organization {organization_id}"
                     )
@@ -106,27 +106,21 @@ class SearchIndexBuilderService:
                     self.indexes[organization_id] = org_indexes
                     return org_indexes
 
-                # Separate chunks with embeddings from those without
-                chunks_with_embeddings = [
-                    c for c in chunks_data if c.get("embedding") is not None
-                ]
-                chunks_without_embeddings = [
-                    c for c in chunks_data if c.get("embedding") is None
-                ]
-
-                if chunks_without_embeddings:
+                vector_count = len(embedding_data["chunk_ids"])
+                missing_count = embedding_data["chunk_count"] - vector_count
+                if missing_count:
                     logger.warning(
-                        f"Found {len(chunks_without_embeddings)} chunks without embeddings "
+                        f"Found {missing_count} chunks without embeddings "
                         f"for organization {organization_id}. These will be excluded from vector search."
                     )
 
                 # Build HNSW index
-                if chunks_with_embeddings:
+                if vector_count:
                     org_indexes.hnsw_index = await self._build_hnsw_index(
-                        organization_id, chunks_with_embeddings
+                        organization_id, embedding_data
                     )
                     logger.info(
-                        f"Built HNSW index with {len(chunks_with_embeddings)} vectors "
+                        f"Built HNSW index with {vector_count} vectors "
                         f"for organization {organization_id}"
                     )
 
@@ -135,10 +129,8 @@ class SearchIndexBuilderService:
                 #     organization_id, chunks_data
                 # )
 
-                org_indexes.chunk_count = len(chunks_data)
-                org_indexes.document_count = len(
-                    set(c["document_id"] for c in chunks_data)
-                )
+                org_indexes.chunk_count = embedding_data["chunk_count"]
+                org_indexes.document_count = embedding_data["document_count"]
                 org_indexes.is_building = False
                 org_indexes.last_updated = datetime.utcnow()
 
@@ -162,7 +154,7 @@ class SearchIndexBuilderService:
                 raise
 
     async def _build_hnsw_index(
-        self, organization_id: str, chunks_with_embeddings: List[Dict[str, Any]]
+        self, organization_id: str, embedding_data: Dict[str, Any]
     ) -> HNSWIndex:
         builder = HNSWBuilder(
             organization_id=organization_id,
@@ -170,18 +162,13 @@ class SearchIndexBuilderService:
             ef_construction=self.hnsw_ef_construction,
         )
 
-        vectors = []
-        chunk_ids = []
-        document_ids = []
-        metadata_list = []
-
-        for chunk in chunks_with_embeddings:
-            vectors.append(chunk["embedding"])
-            chunk_ids.append(chunk["chunk_id"])
-            document_ids.append(chunk["document_id"])
-            metadata_list.append(chunk["metadata"])
-
-        return builder.build_index(vectors, chunk_ids, document_ids, metadata_list)
+        # Rows of the contiguous embedding matrix are passed as views, not copies
+        return builder.build_index(
+            embedding_data["embeddings"],
+            embedding_data["chunk_ids"],
+            embedding_data["document_ids"],
+            embedding_data["metadata"],
+        )
 
     async def add_chunks(
         self, organization_id: str, new_chunks: List[Dict[str, Any]]
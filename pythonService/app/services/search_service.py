@@ -1,4 +1,3 @@
-import json
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
@@ -209,14 +208,7 @@ class SearchService:
 
                 chunk_content_map = {}
                 for row in rows:
-                    chunk_metadata = row["chunk_metadata"]
-                    if isinstance(chunk_metadata, str):
-                        try:
-                            chunk_metadata = json.loads(chunk_metadata)
-                        except (json.JSONDecodeError, TypeError):
-                            chunk_metadata = {}
-                    elif chunk_metadata is None:
-                        chunk_metadata = {}
+                    chunk_metadata = row["chunk_metadata"] or {}
 
                     chunk_content_map[row["chunk_id"]] = {
                         "content": row["content"],
@@ -0,0 +1,140 @@
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+# Marks an int8-quantized vector. Rows written before quantization are raw
+# float32 bytes; their first four bytes would decode to a ~5e-39 denormal.
+QUANTIZED_VECTOR_MAGIC = b"\x00Q8\x00"
+QUANTIZED_HEADER_SIZE = len(QUANTIZED_VECTOR_MAGIC) + 4
+
+
+def quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Args:
+        vector: Float embedding vector
+
+    Returns:
+        The int8 vector and the scale that maps it back to float
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = max_abs / 127 if max_abs > 0 else 1.0
+    quantized = np.round(vector / scale).astype(np.int8)
+    return quantized, scale
+
+
+def encode_vector(vector: np.ndarray, quantize: bool = True) -> bytes:
+    if not quantize:
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    quantized, scale = quantize_int8(vector)
+    return QUANTIZED_VECTOR_MAGIC + np.float32(scale).tobytes() + quantized.tobytes()
+
+
+def encode_vectors(
+    vectors: Union[List[np.ndarray], np.ndarray], quantize: bool = True
+) -> List[bytes]:
+    """
+    Encode a batch of equal-length vectors, or the rows of a matrix, with
+    matrix operations instead of quantizing them one by one. Ragged batches
+    fall back to encode_vector.
+    """
+    if len(vectors) == 0:
+        return []
+
+    try:
+        matrix = np.asarray(vectors, dtype=np.float32)
+    except ValueError:
+        matrix = None
+    if matrix is None or matrix.ndim != 2:
+        return [encode_vector(vector, quantize) for vector in vectors]
+
+    if not quantize:
+        return [row.tobytes() for row in matrix]
+
+    max_abs = np.max(np.abs(matrix), axis=1) if matrix.shape[1] else np.zeros(len(matrix), dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127, 1.0).astype(np.float32)
+    quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+    return [
+        QUANTIZED_VECTOR_MAGIC + scale.tobytes() + row.tobytes()
+        for scale, row in zip(scales, quantized)
+    ]
+
+
+def is_quantized(data: bytes) -> bool:
+    return data[:len(QUANTIZED_VECTOR_MAGIC)] == QUANTIZED_VECTOR_MAGIC
+
+
+def vector_dimension(data: bytes) -> int:
+    if is_quantized(data):
+        return len(data) - QUANTIZED_HEADER_SIZE
+    return len(data) // 4
+
+
+def has_dimension(data: bytes, dimension: int) -> bool:
+    """
+    Whether data is exactly one stored vector of the given dimension. Raw
+    float32 bytes of any multiple of four would otherwise decode silently.
+    """
+    if is_quantized(data):
+        return len(data) == QUANTIZED_HEADER_SIZE + dimension
+    return len(data) == dimension * 4
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """
+    Args:
+        data: Stored vector bytes, either int8-quantized or raw float32
+
+    Returns:
+        The float32 embedding vector
+    """
+    if not is_quantized(data):
+        return np.frombuffer(data, dtype=np.float32)
+
+    scale = np.frombuffer(data, dtype=np.float32, count=1, offset=len(QUANTIZED_VECTOR_MAGIC))[0]
+    quantized = np.frombuffer(data, dtype=np.int8, offset=QUANTIZED_HEADER_SIZE)
+    # Dequantize into one float32 array instead of astype() plus a product
+    return np.multiply(quantized, scale, dtype=np.float32)
+
+
+def decode_vector_matrix(
+    vectors: List[bytes], dimension: int, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Args:
+        vectors: Stored vector bytes of equal dimension, in either format
+        dimension: Embedding dimension
+        out: C-contiguous (N, dimension) float32 array to decode into, e.g. a
+            row slice of a larger matrix
+
+    Returns:
+        An (N, dimension) float32 matrix, filled without a per-row array
+    """
+    matrix = out if out is not None else np.empty((len(vectors), dimension), dtype=np.float32)
+    matrix_buffer = memoryview(matrix).cast("B")
+    row_size = dimension * matrix.itemsize
+
+    quantized_rows = []
+    scales = []
+    quantized_parts = []
+    for i, data in enumerate(vectors):
+        if is_quantized(data):
+            view = memoryview(data)
+            quantized_rows.append(i)
+            scales.append(view[len(QUANTIZED_VECTOR_MAGIC):QUANTIZED_HEADER_SIZE])
+            quantized_parts.append(view[QUANTIZED_HEADER_SIZE:])
+        else:
+            matrix_buffer[i * row_size:(i + 1) * row_size] = data
+
+    # Dequantize all int8 rows with one multiply
+    if quantized_rows:
+        quantized = np.frombuffer(b"".join(quantized_parts), dtype=np.int8).reshape(-1, dimension)
+        scale_values = np.frombuffer(b"".join(scales), dtype=np.float32)[:, None]
+        if len(quantized_rows) == len(vectors):
+            # Every row is quantized: write straight into the matrix
+            np.multiply(quantized, scale_values, out=matrix)
+        else:
+            matrix[quantized_rows] = quantized * scale_values
+
+    return matrix
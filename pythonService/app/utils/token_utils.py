@@ -1,10 +1,22 @@
 import logging
+from functools import lru_cache
 from typing import List, Tuple
+import nltk
 import tiktoken
 from nltk.tokenize import sent_tokenize
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=1)
+def ensure_punkt() -> None:
+    """Fetch the NLTK Punkt tables on first use instead of at import time"""
+    try:
+        nltk.data.find("tokenizers/punkt_tab")
+    except LookupError:
+        nltk.download("punkt_tab")
+
+
 class TokenUtils:
 
     def __init__(self):
@@ -19,6 +31,17 @@ class TokenUtils:
             word_count = len(text.split())
             return int(word_count / 0.75)
 
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for many texts with one tiktoken call, which encodes them
+        in parallel threads instead of one Python round-trip per text
+        """
+        try:
+            return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+        except Exception as e:
+            logger.warning(f"Error counting tokens in batch, counting one by one: {e}")
+            return [self.count_tokens(text) for text in texts]
+
     def truncate_to_token_limit(self, text: str, max_tokens: int) -> str:
         if not text:
             return text
@@ -63,6 +86,7 @@ class TokenUtils:
             return self.truncate_to_token_limit(document, max_tokens)
 
         try:
+            ensure_punkt()
             sentences = sent_tokenize(document)
             if not sentences:
                 return self.truncate_to_token_limit(document, max_tokens)
@@ -122,6 +146,35 @@ class TokenUtils:
 
         return " ".join(section_sentences)
 
+    def build_embedding_text(
+        self,
+        chunk_content: str,
+        context: str,
+        max_tokens: int = 8000,
+        max_context_tokens: int = 200
+    ) -> str:
+        """
+        Chunk content followed by as much of its context as fits in max_tokens,
+        encoding each part once. Summing the parts' token counts can only
+        overestimate the count of the joined text, so the result always fits
+        unless the chunk alone does not.
+        """
+        separator = "\n\nContext: "
+        try:
+            chunk_ids, separator_ids, context_ids = self.encoding.encode_ordinary_batch(
+                [chunk_content, separator, context]
+            )
+        except Exception as e:
+            logger.warning(f"Error encoding embedding text, using chunk only: {e}")
+            return chunk_content
+
+        context_budget = min(max_context_tokens, max_tokens - len(chunk_ids) - len(separator_ids))
+        if context_budget <= 0:
+            logger.error(f"Chunk has {len(chunk_ids)} tokens, leaving no room for context; using chunk only")
+            return chunk_content
+
+        return f"{chunk_content}{separator}{self.encoding.decode(context_ids[:context_budget])}"
+
     def validate_embedding_text_length(self, text: str, max_tokens: int = 8000) -> Tuple[bool, int]:
         token_count = self.count_tokens(text)
         is_valid = token_count <= max_tokens
@@ -3,7 +3,6 @@ For creating mock search data directly in the database without running the docum
 """
 
 import asyncio
-import json
 import numpy as np
 from typing import Dict, Any, List
 from app.services.database_service import database_service
@@ -44,7 +43,7 @@ async def insert_mock_search_data(org_id: str, group_mapping: Dict[str, str]) ->
                 ON CONFLICT (id) DO NOTHING
             ''',
                 chunk["id"], chunk["documentId"], chunk["organizationId"],
-                chunk["content"], json.dumps(chunk["metadata"]), chunk["isDeleted"]
+                chunk["content"], chunk["metadata"], chunk["isDeleted"]
             )
 
         for embedding in mock_data["embeddings"]:
@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.chunking_service import ChunkingService, _greedy_group_breaks
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_service():
+    return ChunkingService()
+
+
+def mock_stream(*fragments):
+    async def stream(prompt, **kwargs):
+        for fragment in fragments:
+            yield fragment
+    return MagicMock(side_effect=stream)
+
+
+class TestChunkingServiceMock:
+
+    @patch('app.services.chunking_service.llm_service')
+    async def test_llm_suggestions_cached_for_identical_text(self, mock_llm, mock_service):
+        mock_llm.stream_model = mock_stream("split_after: 0")
+
+        chunked_text = "[0] First section.\n"
+        first = await mock_service.get_llm_chunking_suggestions(chunked_text)
+        second = await mock_service.get_llm_chunking_suggestions(chunked_text)
+
+        assert first == second == "split_after: 0"
+        assert mock_llm.stream_model.call_count == 1
+
+    @patch('app.services.chunking_service.llm_service')
+    async def test_llm_suggestions_not_shared_between_texts(self, mock_llm, mock_service):
+        mock_llm.stream_model = mock_stream("split_after: none")
+
+        await mock_service.get_llm_chunking_suggestions("[0] A.\n")
+        await mock_service.get_llm_chunking_suggestions("[0] B.\n")
+
+        assert mock_llm.stream_model.call_count == 2
+
+    @patch('app.services.chunking_service.llm_service')
+    async def test_llm_suggestions_stop_after_split_line(self, mock_llm, mock_service):
+        mock_llm.stream_model = mock_stream("split_after: 1,", " 3\n", "trailing commentary")
+
+        response = await mock_service.get_llm_chunking_suggestions("[0] A.\n")
+
+        assert response == "split_after: 1, 3\n"
+
+    async def test_chunk_documents_batch_preserves_order(self, mock_service):
+        mock_chunk = AsyncMock(side_effect=lambda text: [text.upper()])
+
+        with patch.object(ChunkingService, 'chunk_document', mock_chunk):
+            results = await mock_service.chunk_documents_batch(["first doc", "second doc"])
+
+        assert results == [["FIRST DOC"], ["SECOND DOC"]]
+        assert mock_chunk.await_count == 2
+
+    async def test_greedy_group_breaks(self):
+        # 200 + 200 exceeds the target once the group is at least half full
+        assert _greedy_group_breaks([200, 200, 100, 300], 300) == [1, 3]
+        # a group below half the target keeps absorbing sentences
+        assert _greedy_group_breaks([100, 400, 50], 300) == [2]
+        assert _greedy_group_breaks([], 300) == []
+
+    async def test_split_uses_pre_extracted_chunks(self, mock_service):
+        chunks = ["Alpha one.", "Beta two.", "Gamma three."]
+
+        sections = mock_service.split_text_by_llm_suggestions(
+            "", "split_after: 0", chunks
+        )
+
+        assert sections == ["Alpha one.", "Beta two.\nGamma three."]
+
+    async def test_extract_chunks_from_numeric_markers(self, mock_service):
+        chunked_text = "[0] First chunk.\n[1] Second chunk\nspanning lines.\n"
+
+        assert mock_service.extract_chunks(chunked_text) == [
+            "First chunk.",
+            "Second chunk\nspanning lines.",
+        ]
+
+    async def test_extract_chunks_keeps_bracketed_number_lines(self, mock_service):
+        chunked_text = "[0] Sources:\n[1]: Smith 2020\n[2]\n[1] Second chunk.\n"
+
+        assert mock_service.extract_chunks(chunked_text) == [
+            "Sources:\n[1]: Smith 2020\n[2]",
+            "Second chunk.",
+        ]
+
+    async def test_regex_sentence_splitter(self, mock_service):
+        mock_service.use_punkt = False
+
+        sentences = mock_service.split_into_sentences("First one. Second one! (Third) one? 4 items.")
+
+        assert sentences == ["First one.", "Second one!", "(Third) one?", "4 items."]
+
+    @patch('app.services.chunking_service.llm_service')
+    async def test_short_document_skips_llm(self, mock_llm, mock_service):
+        mock_llm.stream_model = mock_stream("split_after: 0")
+
+        chunks = await mock_service.chunk_document("A short note. Nothing else to say.")
+
+        assert chunks == ["A short note. Nothing else to say."]
+        mock_llm.stream_model.assert_not_called()
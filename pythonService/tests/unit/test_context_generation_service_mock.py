@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.context_generation_service import ContextGenerationService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_service():
+    return ContextGenerationService()
+
+
+class TestContextGenerationServiceMock:
+
+    async def test_extract_chunk_content_and_context(self, mock_service):
+        contextualized = (
+            "<chunk_context> About pricing. </chunk_context>\n<chunk>\nPlans cost $5.\n</chunk>"
+        )
+
+        assert mock_service.extract_chunk_content(contextualized) == "Plans cost $5."
+        assert mock_service.extract_chunk_context(contextualized) == "About pricing."
+
+    async def test_extract_falls_back_without_tags(self, mock_service):
+        assert mock_service.extract_chunk_content("plain text") == "plain text"
+        assert mock_service.extract_chunk_context("plain text") == ""
+
+    async def test_extract_falls_back_on_unclosed_tag(self, mock_service):
+        assert mock_service.extract_chunk_content("<chunk>open") == "<chunk>open"
+        assert mock_service.extract_chunk_context("<chunk_context>open") == ""
+
+    async def test_fallback_context_uses_first_sentence(self, mock_service):
+        assert mock_service._create_fallback_context(
+            "Quarterly Revenue Grew. Costs fell."
+        ) == "This content discusses quarterly revenue grew."
+        assert mock_service._create_fallback_context(
+            "Short. Then a much longer sentence."
+        ) == "This content covers information from the document."
+
+    async def test_duplicate_chunks_generate_context_once(self, mock_service):
+        mock_generate = AsyncMock(side_effect=lambda chunk, document: f"ctx:{chunk}")
+
+        with patch.object(mock_service, 'generate_context_for_chunk', mock_generate):
+            contexts = await mock_service.generate_contexts_for_chunks(
+                ["Header", "Body", "Header"], "Header Body Header"
+            )
+
+        assert contexts == ["ctx:Header", "ctx:Body", "ctx:Header"]
+        assert mock_generate.await_count == 2
+
+    async def test_build_prompt_matches_template_format(self, mock_service):
+        prompt = mock_service._build_prompt("The {document} body", "A chunk")
+
+        assert prompt == mock_service.contextualizer_prompt.format(
+            document="The {document} body", chunk="A chunk"
+        )
+
+    async def test_stream_contextualized_chunks_yields_in_order(self, mock_service):
+        async def generate(chunk, document):
+            # later chunks finish first
+            await asyncio.sleep(0.01 if chunk == "First" else 0)
+            return f"ctx:{chunk}" if chunk != "Bare" else ""
+
+        with patch.object(mock_service, 'generate_context_for_chunk', AsyncMock(side_effect=generate)):
+            results = [
+                result
+                async for result in mock_service.stream_contextualized_chunks(
+                    ["First", "Bare"], "First Bare"
+                )
+            ]
+
+        assert results == [
+            "<chunk_context>ctx:First</chunk_context>\n<chunk>First</chunk>",
+            "<chunk>Bare</chunk>",
+        ]
+
+    @patch('app.services.context_generation_service.llm_service')
+    async def test_repeated_document_served_from_context_cache(self, mock_llm, mock_service):
+        mock_llm.call_model = AsyncMock(return_value="About pricing.")
+
+        first = await mock_service.generate_context_for_chunk("Plans cost $5.", "Pricing doc")
+        second = await mock_service.generate_context_for_chunk("Plans cost $5.", "Pricing doc")
+        await mock_service.generate_context_for_chunk("Plans cost $5.", "Other doc")
+
+        assert first == second == "About pricing."
+        assert mock_llm.call_model.await_count == 2
+
+    @patch('app.services.context_generation_service.llm_service')
+    async def test_document_prepared_once_for_all_chunks(self, mock_llm, mock_service):
+        mock_llm.call_model = AsyncMock(return_value="About pricing.")
+        mock_prepare = MagicMock(side_effect=lambda document: (document, 10))
+
+        with patch.object(mock_service, '_prepare_document_for_context', mock_prepare):
+            await mock_service.generate_contexts_for_chunks(["A.", "B.", "C."], "Pricing doc")
+
+        assert mock_prepare.call_count == 1
+        prompts = [call.args[0] for call in mock_llm.call_model.await_args_list]
+        assert mock_service._build_prompt("Pricing doc", "C.") in prompts
+
+    @patch('app.services.context_generation_service.llm_service')
+    async def test_cancelled_consumer_does_not_poison_document_cache(self, mock_llm, mock_service):
+        mock_llm.call_model = AsyncMock(return_value="About pricing.")
+        started = threading.Event()
+        release = threading.Event()
+
+        def prepare(document):
+            started.set()
+            release.wait(5)
+            return document, 10
+
+        mock_prepare = MagicMock(side_effect=prepare)
+
+        with patch.object(mock_service, '_prepare_document_for_context', mock_prepare):
+            consumer = asyncio.create_task(
+                mock_service.generate_contexts_for_chunks(["A.", "B."], "Pricing doc")
+            )
+            await asyncio.to_thread(started.wait, 5)
+            consumer.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await consumer
+            release.set()
+
+            contexts = await mock_service.generate_contexts_for_chunks(["A.", "B."], "Pricing doc")
+
+        assert contexts == ["About pricing.", "About pricing."]
+        assert mock_prepare.call_count == 1
+
+    async def test_document_cache_is_bounded(self, mock_service):
+        for i in range(mock_service.document_cache_size + 2):
+            mock_service._document_entry(mock_service._document_digest(f"doc {i}"))
+
+        assert len(mock_service._document_cache) == mock_service.document_cache_size
+        assert mock_service._document_digest("doc 0") not in mock_service._document_cache
@@ -0,0 +1,327 @@
+import asyncio
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.database_service import COPY_THRESHOLD, DatabaseService
+from app.utils.quant import decode_vector, encode_vector, encode_vectors
+
+pytestmark = pytest.mark.asyncio
+
+
+def async_context(value):
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=value)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+@pytest.fixture
+def mock_conn():
+    conn = MagicMock()
+    conn.executemany = AsyncMock()
+    conn.copy_records_to_table = AsyncMock()
+    conn.fetch = AsyncMock(return_value=[make_document("doc-1"), make_document("doc-2")])
+    conn.transaction = MagicMock(return_value=async_context(None))
+    return conn
+
+
+@pytest.fixture
+def mock_service(mock_conn):
+    service = DatabaseService()
+    service.pool = MagicMock()
+    service.pool.acquire = MagicMock(return_value=async_context(mock_conn))
+    return service
+
+
+class MockRecord(dict):
+    """Like asyncpg.Record, readable by column name or by position"""
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return super().__getitem__(key)
+
+
+def make_row(chunk_id, document_id, vector):
+    # Columns in ORGANIZATION_CHUNKS_QUERY order
+    return MockRecord({
+        "chunk_id": chunk_id,
+        "content": "Body",
+        "chunk_metadata": {"topic": "a", "document_title": "stale"},
+        "document_id": document_id,
+        "vector": None if vector is None else np.asarray(vector, dtype=np.float32).tobytes(),
+        "embedding_id": f"emb-{chunk_id}",
+    })
+
+
+def make_embedding_row(chunk_id, document_id, vector):
+    # Columns in ORGANIZATION_EMBEDDINGS_QUERY order
+    return MockRecord({
+        "chunk_id": chunk_id,
+        "chunk_metadata": {"topic": "a"},
+        "document_id": document_id,
+        "vector": np.asarray(vector, dtype=np.float32).tobytes(),
+    })
+
+
+def make_document(document_id):
+    return {
+        "id": document_id,
+        "title": f"Title {document_id}",
+        "accessLevel": "GROUP",
+        "groupId": "group-1",
+        "restrictedToUsers": None,
+        "metadata": None,
+    }
+
+
+def mock_cursor(*rows):
+    async def cursor(query, *args, prefetch):
+        for row in rows:
+            yield row
+    return MagicMock(side_effect=cursor)
+
+
+class TestDatabaseServiceMock:
+
+    async def test_small_chunk_batch_uses_executemany(self, mock_service, mock_conn):
+        chunks_data = [{"content": "First"}, {"content": "Second", "metadata": {"a": 1}}]
+
+        chunk_ids = await mock_service.save_chunks_bulk(chunks_data, "doc-1", "org-1")
+
+        assert len(chunk_ids) == 2
+        mock_conn.copy_records_to_table.assert_not_called()
+        query, records = mock_conn.executemany.await_args.args
+        assert query.startswith('INSERT INTO "Chunk"')
+        assert [record[0] for record in records] == chunk_ids
+        assert records[1][4] == {"a": 1}
+
+    async def test_chunk_batch_keeps_caller_ids(self, mock_service, mock_conn):
+        chunk_ids = await mock_service.save_chunks_bulk(
+            [{"content": "First"}], "doc-1", "org-1", chunk_ids=["chunk-1"]
+        )
+
+        assert chunk_ids == ["chunk-1"]
+        _, records = mock_conn.executemany.await_args.args
+        assert records[0][0] == "chunk-1"
+
+    async def test_large_embedding_batch_uses_copy(self, mock_service, mock_conn):
+        vectors = [np.ones(4) for _ in range(COPY_THRESHOLD)]
+        chunk_ids = [f"chunk-{i}" for i in range(COPY_THRESHOLD)]
+
+        embedding_ids = await mock_service.save_embeddings_bulk(
+            vectors, chunk_ids, "doc-1", "org-1"
+        )
+
+        assert len(embedding_ids) == COPY_THRESHOLD
+        mock_conn.executemany.assert_not_called()
+        kwargs = mock_conn.copy_records_to_table.await_args.kwargs
+        assert kwargs["records"][0][1] == "chunk-0"
+        assert kwargs["records"][0][4] == encode_vector(np.ones(4))
+
+    async def test_embedding_matrix_saved_row_per_chunk(self, mock_service, mock_conn):
+        matrix = np.ones((2, 4), dtype=np.float32)
+
+        embedding_ids = await mock_service.save_embeddings_bulk(
+            matrix, ["chunk-0", "chunk-1"], "doc-1", "org-1"
+        )
+
+        assert len(embedding_ids) == 2
+        records = mock_conn.executemany.await_args.args[1]
+        assert [record[4] for record in records] == [encode_vector(np.ones(4))] * 2
+
+    async def test_single_row_wrapper_returns_id(self, mock_service, mock_conn):
+        chunk_id = await mock_service.save_chunk({"content": "Only"}, "doc-1", "org-1")
+
+        records = mock_conn.executemany.await_args.args[1]
+        assert records[0][0] == chunk_id
+
+    async def test_bulk_session_reuses_one_connection(self, mock_service, mock_conn):
+        async with mock_service.bulk_session() as conn:
+            chunk_id = await mock_service.save_chunk_conn(conn, {"content": "Only"}, "doc-1", "org-1")
+            await mock_service.save_embedding_conn(conn, np.ones(4), chunk_id, "doc-1", "org-1")
+
+        assert mock_service.pool.acquire.call_count == 1
+        assert mock_conn.transaction.call_count == 1
+        assert mock_conn.executemany.await_count == 2
+        assert mock_conn.executemany.await_args.args[1][0][1] == chunk_id
+
+    async def test_empty_batch_skips_database(self, mock_service):
+        assert await mock_service.save_chunks_bulk([], "doc-1", "org-1") == []
+        mock_service.pool.acquire.assert_not_called()
+
+    async def test_iter_chunks_streams_rows_through_cursor(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(make_row("chunk-1", "doc-1", [1.0, 1.0, 1.0, 1.0]))
+
+        results = [
+            result
+            async for result in mock_service.iter_chunks_and_embeddings_for_organization(
+                "org-1", batch_size=10
+            )
+        ]
+
+        assert len(results) == 1
+        assert mock_conn.cursor.call_args.kwargs["prefetch"] == 10
+        assert results[0]["metadata"]["topic"] == "a"
+        assert results[0]["metadata"]["document_title"] == "Title doc-1"
+        assert results[0]["metadata"]["restrictedToUsers"] == []
+        assert results[0]["embedding"].tolist() == [1.0, 1.0, 1.0, 1.0]
+
+    async def test_embedding_matrix_is_contiguous(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(
+            make_row("chunk-1", "doc-1", [1.0, 2.0]),
+            make_row("chunk-2", "doc-1", None),
+            make_row("chunk-3", "doc-2", [3.0, 4.0]),
+            make_row("chunk-4", "deleted-doc", [5.0, 6.0]),
+        )
+
+        data = await mock_service.get_embedding_matrix_for_organization(
+            "org-1", include_unembedded=True
+        )
+
+        assert data["embeddings"].shape == (2, 2)
+        assert data["embeddings"].flags["C_CONTIGUOUS"]
+        assert data["embeddings"].tolist() == [[1.0, 2.0], [3.0, 4.0]]
+        assert data["chunk_ids"] == ["chunk-1", "chunk-3"]
+        assert data["document_ids"] == ["doc-1", "doc-2"]
+        assert data["chunk_count"] == 3
+        assert data["document_count"] == 2
+
+    async def test_embedding_matrix_reads_quantized_and_float_rows(self, mock_service, mock_conn):
+        quantized_row = make_embedding_row("chunk-2", "doc-1", [])
+        quantized_row["vector"] = encode_vector(np.array([0.5, -1.0]))
+        mock_conn.cursor = mock_cursor(make_embedding_row("chunk-1", "doc-1", [1.0, 2.0]), quantized_row)
+        mock_conn.fetchrow = AsyncMock(return_value={"chunk_count": 2, "document_count": 1})
+
+        data = await mock_service.get_embedding_matrix_for_organization("org-1")
+
+        assert data["embeddings"].shape == (2, 2)
+        assert np.allclose(data["embeddings"][1], [0.5, -1.0], atol=0.01)
+
+    async def test_embedding_matrix_counts_chunks_separately(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(
+            make_embedding_row("chunk-1", "doc-1", [1.0, 2.0]),
+            make_embedding_row("chunk-3", "doc-2", [3.0, 4.0]),
+        )
+        mock_conn.fetchrow = AsyncMock(return_value={"chunk_count": 5, "document_count": 2})
+
+        data = await mock_service.get_embedding_matrix_for_organization("org-1")
+
+        query = mock_conn.cursor.call_args.args[0]
+        assert 'JOIN "Embedding"' in query and "LEFT JOIN" not in query
+        assert data["chunk_ids"] == ["chunk-1", "chunk-3"]
+        assert data["metadata"][1]["document_title"] == "Title doc-2"
+        assert data["chunk_count"] == 5
+        assert data["document_count"] == 2
+
+    async def test_embedding_matrix_projects_metadata_fields(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(make_embedding_row("chunk-1", "doc-1", [1.0, 2.0]))
+        mock_conn.fetchrow = AsyncMock(return_value={"chunk_count": 1, "document_count": 1})
+
+        data = await mock_service.get_embedding_matrix_for_organization(
+            "org-1", metadata_fields=frozenset({"accessLevel", "document_title", "topic", "missing"})
+        )
+
+        assert data["metadata"] == [
+            {"accessLevel": "GROUP", "document_title": "Title doc-1", "topic": "a"}
+        ]
+
+    async def test_embedding_matrix_grows_across_batches(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(
+            make_row("chunk-1", "doc-1", [1.0, 2.0]),
+            make_row("chunk-2", "doc-1", [3.0, 4.0]),
+            make_row("chunk-3", "doc-2", [5.0, 6.0]),
+        )
+
+        data = await mock_service.get_embedding_matrix_for_organization(
+            "org-1", batch_size=1, include_unembedded=True
+        )
+
+        assert data["embeddings"].shape == (3, 2)
+        assert data["embeddings"].tolist() == [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+
+    async def test_embedding_matrix_skips_malformed_vectors(self, mock_service, mock_conn):
+        truncated_row = make_embedding_row("chunk-2", "doc-1", [])
+        truncated_row["vector"] = np.array([3.0, 4.0], dtype=np.float32).tobytes()[:-1]
+        mock_conn.cursor = mock_cursor(
+            make_embedding_row("chunk-1", "doc-1", [1.0, 2.0]),
+            truncated_row,
+            make_embedding_row("chunk-3", "doc-1", [5.0, 6.0, 7.0]),
+        )
+        mock_conn.fetchrow = AsyncMock(return_value={"chunk_count": 3, "document_count": 1})
+
+        data = await mock_service.get_embedding_matrix_for_organization("org-1")
+
+        assert data["chunk_ids"] == ["chunk-1"]
+        assert data["embeddings"].tolist() == [[1.0, 2.0]]
+
+    async def test_quantized_vector_round_trip(self):
+        vector = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+
+        encoded = encode_vector(vector)
+        decoded = decode_vector(encoded)
+
+        assert len(encoded) < vector.nbytes
+        cosine = vector @ decoded / (np.linalg.norm(vector) * np.linalg.norm(decoded))
+        assert cosine > 0.999
+        assert np.array_equal(decode_vector(encode_vector(vector, quantize=False)), vector)
+
+    async def test_mark_chunks_deleted_batches_ids(self, mock_service, mock_conn):
+        mock_conn.execute = AsyncMock(side_effect=["UPDATE 10000", "UPDATE 5"])
+        chunk_ids = [f"chunk-{i}" for i in range(10_005)]
+
+        with patch('app.services.database_service.logger') as mock_logger:
+            await mock_service.mark_chunks_deleted("org-1", chunk_ids)
+
+        batches = [call.args[1] for call in mock_conn.execute.await_args_list]
+        assert [len(batch) for batch in batches] == [10_000, 5]
+        assert "Marked 10005 chunks" in mock_logger.info.call_args.args[0]
+
+    async def test_chunk_embeddings_share_one_matrix(self, mock_service, mock_conn):
+        mock_conn.cursor = mock_cursor(
+            make_row("chunk-1", "doc-1", [1.0, 2.0]),
+            make_row("chunk-2", "doc-1", None),
+            make_row("chunk-3", "doc-2", [3.0, 4.0]),
+        )
+
+        with pytest.warns(DeprecationWarning):
+            results = await mock_service.get_chunks_and_embeddings_for_organization("org-1")
+
+        assert [r["chunk_id"] for r in results] == ["chunk-1", "chunk-2", "chunk-3"]
+        assert results[1]["embedding"] is None
+        assert results[2]["embedding"].tolist() == [3.0, 4.0]
+        assert results[0]["embedding"].base is results[2]["embedding"].base
+
+    async def test_batch_encoding_matches_single_vector_encoding(self):
+        vectors = list(np.random.default_rng(1).standard_normal((3, 16)).astype(np.float32))
+
+        batch = encode_vectors(vectors)
+
+        assert len(batch) == 3
+        for encoded, vector in zip(batch, vectors):
+            assert np.allclose(decode_vector(encoded), decode_vector(encode_vector(vector)), atol=1e-6)
+        assert encode_vectors([np.ones(2), np.ones(3)]) == [encode_vector(np.ones(2)), encode_vector(np.ones(3))]
+
+    async def test_access_denials_written_in_one_batch(self, mock_service, mock_conn):
+        for chunk_id in ("chunk-1", "chunk-2"):
+            await mock_service.log_access_denial(
+                "org-1", "user-1", "query", chunk_id, "doc-1", "group-1", "GROUP", "not_in_group"
+            )
+        mock_conn.executemany.assert_not_called()
+
+        await asyncio.sleep(0.2)
+
+        query, records = mock_conn.executemany.await_args.args
+        assert query.startswith('INSERT INTO "AccessDenialLog"')
+        assert [record[4] for record in records] == ["chunk-1", "chunk-2"]
+
+    async def test_flush_writes_queued_access_denials(self, mock_service, mock_conn):
+        mock_service.queue_access_denial(
+            "org-1", "user-1", "query", "chunk-1", "doc-1", None, "GROUP", "not_in_group"
+        )
+
+        await mock_service.flush_access_denials()
+
+        assert mock_conn.executemany.await_count == 1
+        assert mock_service._denial_queue.empty()
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.document_processing_pipeline import DocumentProcessingPipelineService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_pipeline():
+    pipeline = DocumentProcessingPipelineService()
+    pipeline._convert_document = AsyncMock(return_value="# Doc")
+    pipeline._clean_text = AsyncMock(return_value="Doc")
+    pipeline._create_chunks = AsyncMock(return_value=[{"content": "Doc"}])
+    return pipeline
+
+
+def persisted_chunks(events):
+    chunks = [{"chunk_id": "chunk-1", "document_id": "doc-1", "embedding": None, "metadata": {}}]
+
+    async def persist():
+        await asyncio.sleep(0)
+        events.append("persisted")
+
+    async def process(*args):
+        return chunks, asyncio.create_task(persist())
+
+    return process
+
+
+class TestDocumentProcessingPipelineMock:
+
+    @patch('app.services.document_processing_pipeline.search_index_builder')
+    async def test_new_index_is_built_after_chunks_are_persisted(self, mock_builder, mock_pipeline):
+        events = []
+        mock_builder.has_indexes = MagicMock(return_value=False)
+        mock_builder.build_or_update_index = AsyncMock(side_effect=lambda org: events.append("built"))
+        mock_pipeline._process_chunks_batch = persisted_chunks(events)
+
+        result = await mock_pipeline.process_document("/nonexistent", "doc-1", "org-1", {})
+
+        assert result["status"] == "completed"
+        assert events == ["persisted", "built"]
+        mock_builder.add_chunks.assert_not_called()
+
+    @patch('app.services.document_processing_pipeline.search_index_builder')
+    async def test_existing_index_is_updated_while_persisting(self, mock_builder, mock_pipeline):
+        events = []
+        mock_builder.has_indexes = MagicMock(return_value=True)
+        mock_builder.add_chunks = AsyncMock(side_effect=lambda org, chunks: events.append("added"))
+        mock_pipeline._process_chunks_batch = persisted_chunks(events)
+
+        result = await mock_pipeline.process_document("/nonexistent", "doc-1", "org-1", {})
+
+        assert result["status"] == "completed"
+        assert events == ["added", "persisted"]
+        mock_builder.build_or_update_index.assert_not_called()
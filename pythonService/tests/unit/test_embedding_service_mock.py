@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.embedding_service import EmbeddingService, FALLBACK_LOCAL_MODEL, _normalize_rows
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_service():
+    service = EmbeddingService()
+    service.provider = 'local'
+    return service
+
+
+def mock_local_batch():
+    def embed(texts, normalize, batch_size, show_progress):
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+    return MagicMock(side_effect=embed)
+
+
+class TestEmbeddingServiceMock:
+
+    async def test_cached_texts_are_not_embedded_again(self, mock_service):
+        mock_batch = mock_local_batch()
+
+        with patch.object(mock_service, '_generate_embeddings_batch_local', mock_batch):
+            first = await mock_service.generate_embeddings_matrix(["a", "bb"])
+            second = await mock_service.generate_embeddings_matrix(["bb", "ccc", "a"])
+
+        assert first.tolist() == [[1.0, 1.0], [2.0, 1.0]]
+        assert second.tolist() == [[2.0, 1.0], [3.0, 1.0], [1.0, 1.0]]
+        assert mock_batch.call_args_list[1].args[0] == ["ccc"]
+
+    async def test_duplicate_texts_embedded_once(self, mock_service):
+        mock_batch = mock_local_batch()
+
+        with patch.object(mock_service, '_generate_embeddings_batch_local', mock_batch):
+            matrix = await mock_service.generate_embeddings_matrix(["a", "a", "bb"])
+
+        assert matrix.tolist() == [[1.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+        assert mock_batch.call_args.args[0] == ["a", "bb"]
+
+    async def test_batch_returns_row_views(self, mock_service):
+        with patch.object(mock_service, '_generate_embeddings_batch_local', mock_local_batch()):
+            embeddings = await mock_service.generate_embeddings_batch(["a", "bb"])
+
+        assert len(embeddings) == 2
+        assert embeddings[0].base is embeddings[1].base
+
+    async def test_normalize_rows_in_place(self):
+        matrix = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+
+        result = _normalize_rows(matrix)
+
+        assert result is matrix
+        assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+    async def test_openai_sub_batches_keep_order(self, mock_service):
+        mock_service.provider = 'openai'
+        mock_service.openai_client = MagicMock()
+        mock_service.cache_size = 0
+        mock_batch = AsyncMock(side_effect=lambda texts: np.array(
+            [[len(text), 0.0] for text in texts], dtype=np.float32
+        ))
+
+        with patch.object(mock_service, '_generate_embeddings_batch_openai', mock_batch):
+            matrix = await mock_service.generate_embeddings_matrix(
+                ["a", "bb", "ccc", "dddd", "eeeee"], batch_size=2
+            )
+
+        assert mock_batch.await_count == 3
+        assert matrix[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    async def test_fallback_model_not_reloaded_after_it_fails(self, mock_service):
+        mock_service.local_model_name = FALLBACK_LOCAL_MODEL
+        mock_load = MagicMock(side_effect=OSError("download failed"))
+
+        with patch.object(mock_service, '_load_local_model', mock_load):
+            with pytest.raises(OSError):
+                mock_service.local_model
+
+        assert mock_load.call_count == 1
@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+import torch
+from unittest.mock import AsyncMock
+
+from app.services.gnn_service import GNNRecommendation
+
+pytestmark = pytest.mark.asyncio
+
+
+# Rows in the column order of the graph queries
+USERS = [
+    ("user-1", 10, 1, 1, True),
+    ("user-2", 3, 1, 0, False),
+]
+GROUPS = [
+    ("group-1", "org-1", False, 5, 1),
+]
+ORGANIZATIONS = [
+    ("org-1", 30, 2, 1),
+]
+USER_ORG_MEMBERSHIPS = [
+    ("user-1", "org-1"),
+    ("user-2", "org-1"),
+]
+USER_GROUP_MEMBERSHIPS = [
+    ("user-1", "group-1"),
+]
+
+
+@pytest.fixture
+def mock_service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = GNNRecommendation()
+    service.fetch_users = AsyncMock(return_value=USERS)
+    service.fetch_groups = AsyncMock(return_value=GROUPS)
+    service.fetch_organizations = AsyncMock(return_value=ORGANIZATIONS)
+    service.fetch_user_org_memberships = AsyncMock(return_value=USER_ORG_MEMBERSHIPS)
+    service.fetch_user_group_memberships = AsyncMock(return_value=USER_GROUP_MEMBERSHIPS)
+    return service
+
+
+class TestGNNRecommendationMock:
+
+    async def test_graph_is_cached_until_invalidated(self, mock_service):
+        first = await mock_service.build_graph()
+        second = await mock_service.build_graph()
+
+        assert first is second
+        assert mock_service.fetch_users.await_count == 1
+
+        mock_service.invalidate_graph()
+        await mock_service.build_graph()
+
+        assert mock_service.fetch_users.await_count == 2
+
+    async def test_forced_rebuild_skips_cache(self, mock_service):
+        first = await mock_service.build_graph()
+        second = await mock_service.build_graph(force=True)
+
+        assert first is not second
+        assert mock_service.user_to_idx == {"user-1": 0, "user-2": 1}
+
+    async def test_training_builds_graph_once(self, mock_service):
+        mock_service.get_training_data = AsyncMock(return_value=[
+            {"userId": "user-1", "groupId": "group-1", "joined": True},
+            {"userId": "user-2", "groupId": "group-1", "joined": False},
+        ])
+
+        await mock_service.train_gnn(num_epochs=3)
+
+        assert mock_service.fetch_users.await_count == 1
+
+    async def test_edge_index_and_reverse_edges(self, mock_service):
+        mock_service.fetch_user_org_memberships.return_value = USER_ORG_MEMBERSHIPS + [
+            ("deleted-user", "org-1"),
+        ]
+
+        graph = await mock_service.build_graph()
+
+        assert graph['user', 'member_of', 'organization'].edge_index.tolist() == [[0, 1], [0, 0]]
+        assert graph['organization', 'has_member', 'user'].edge_index.tolist() == [[0, 0], [0, 1]]
+        assert graph['group', 'contains', 'user'].edge_index.tolist() == [[0], [0]]
+
+    async def test_recommendations_fetch_candidate_details_once(self, mock_service):
+        mock_service.get_current_group_members = AsyncMock(return_value=["user-1"])
+        mock_service.get_group_organization = AsyncMock(return_value={"id": "org-1", "name": "Acme"})
+        mock_service.get_candidate_details = AsyncMock(return_value=[
+            {"id": "user-2", "name": "Bo", "email": "bo@acme.test", "in_group_org": True, "shared_connections": 0},
+        ])
+        mock_service.get_user_info = AsyncMock()
+
+        recommendations = await mock_service.recommend_users_for_group("group-1")
+
+        assert [r["userId"] for r in recommendations] == ["user-2"]
+        assert recommendations[0]["reason"] == "Member of Acme organization"
+        mock_service.get_candidate_details.assert_awaited_once_with(["user-2"], "group-1")
+        mock_service.get_user_info.assert_not_awaited()
+
+    async def test_recommendations_use_mappings_of_their_graph(self, mock_service):
+        async def members_after_rebuild(group_id):
+            # Another caller rebuilds the graph with new user indices meanwhile
+            mock_service.fetch_users.return_value = [("user-3", 1, 1, 0, False)] + USERS
+            await mock_service.build_graph(force=True)
+            return ["user-1"]
+
+        mock_service.get_current_group_members = AsyncMock(side_effect=members_after_rebuild)
+        mock_service.get_group_organization = AsyncMock(return_value={"id": "org-1", "name": "Acme"})
+        mock_service.get_candidate_details = AsyncMock(return_value=[
+            {"id": "user-2", "name": "Bo", "email": "bo@acme.test", "in_group_org": True, "shared_connections": 0},
+        ])
+
+        recommendations = await mock_service.recommend_users_for_group("group-1")
+
+        assert [r["userId"] for r in recommendations] == ["user-2"]
+        assert mock_service.user_to_idx == {"user-3": 0, "user-1": 1, "user-2": 2}
+
+    async def test_concurrent_builds_query_once(self, mock_service):
+        first, second = await asyncio.gather(
+            mock_service.build_graph(), mock_service.build_graph()
+        )
+
+        assert first is second
+        assert mock_service.fetch_users.await_count == 1
+
+    async def test_training_tensors_skip_unknown_ids(self, mock_service):
+        await mock_service.build_graph()
+
+        user_index, group_index, targets = mock_service._materialize_training_tensors([
+            {"userId": "user-2", "groupId": "group-1", "joined": False},
+            {"userId": "deleted-user", "groupId": "group-1", "joined": True},
+            {"userId": "user-1", "groupId": "group-1", "joined": True},
+        ])
+
+        assert user_index.tolist() == [1, 0]
+        assert group_index.tolist() == [0, 0]
+        assert targets.tolist() == [0.0, 1.0]
+
+    async def test_checkpoint_restores_graph_snapshot(self, mock_service, tmp_path):
+        mock_service.get_training_data = AsyncMock(return_value=[
+            {"userId": "user-1", "groupId": "group-1", "joined": True},
+        ])
+        await mock_service.train_gnn(num_epochs=1)
+        graph = await mock_service.build_graph()
+        filepath = tmp_path / "gnn_model.pt"
+        mock_service.save_model(filepath)
+
+        restored = GNNRecommendation()
+        assert restored.load_model(filepath)
+        restored_graph = await restored.build_graph()
+
+        assert restored.user_to_idx == mock_service.user_to_idx
+        assert restored_graph['user'].x.tolist() == graph['user'].x.tolist()
+        assert (
+            restored_graph['user', 'belongs_to', 'group'].edge_index.tolist()
+            == graph['user', 'belongs_to', 'group'].edge_index.tolist()
+        )
+
+    async def test_no_recommendations_when_everyone_is_a_member(self, mock_service):
+        mock_service.get_current_group_members = AsyncMock(return_value=["user-1", "user-2"])
+        mock_service.get_candidate_details = AsyncMock()
+
+        assert await mock_service.recommend_users_for_group("group-1") == []
+        mock_service.get_candidate_details.assert_not_awaited()
+
+    async def test_node_features_are_float32(self, mock_service):
+        graph = await mock_service.build_graph()
+
+        assert graph['user'].x.dtype == torch.float32
+        assert graph['user'].x.tolist() == [[1.0, 1.0, 10.0, 1.0], [1.0, 0.0, 3.0, 0.0]]
+        assert graph['organization'].x.tolist() == [[2.0, 1.0, 30.0]]
@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.metadata_extraction_service import MetadataExtractionService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_service():
+    return MetadataExtractionService()
+
+
+class TestMetadataExtractionServiceMock:
+
+    @patch('app.services.metadata_extraction_service.llm_service')
+    async def test_batch_extraction_uses_one_request(self, mock_llm, mock_service):
+        mock_llm.call_model = AsyncMock(return_value="""```json
+[
+    {"keywords": ["pricing"], "topics": ["plans"], "entities": [], "document_type": "Manual"},
+    {"keywords": ["support"], "topics": ["help"], "entities": ["Acme"], "document_type": "manual"}
+]
+```""")
+
+        metadata = await mock_service.extract_metadata_batch(["Plans cost $5.", "Contact Acme."])
+
+        assert mock_llm.call_model.await_count == 1
+        assert [m["keywords"] for m in metadata] == [["pricing"], ["support"]]
+        assert metadata[0]["document_type"] == "manual"
+
+    @patch('app.services.metadata_extraction_service.llm_service')
+    async def test_batch_extraction_falls_back_on_count_mismatch(self, mock_llm, mock_service):
+        mock_llm.call_model = AsyncMock(side_effect=[
+            '[{"keywords": ["only one"]}]',
+            '{"keywords": ["first"]}',
+            '{"keywords": ["second"]}',
+        ])
+
+        metadata = await mock_service.extract_metadata_batch(["First.", "Second."])
+
+        assert mock_llm.call_model.await_count == 3
+        assert [m["keywords"] for m in metadata] == [["first"], ["second"]]
+
+    async def test_batch_extraction_splits_into_batches(self, mock_service):
+        mock_service.batch_size = 2
+        mock_batch = AsyncMock(side_effect=lambda chunks, context: [{"chunk": c} for c in chunks])
+
+        with patch.object(mock_service, '_extract_metadata_for_batch', mock_batch):
+            metadata = await mock_service.extract_metadata_batch(["a", "b", "c"])
+
+        assert metadata == [{"chunk": "a"}, {"chunk": "b"}, {"chunk": "c"}]
+        assert mock_batch.await_count == 2